@@ -1,13 +1,27 @@
+import importlib
 import streamlit as st
-import pandas as pd
-from db.database import init_db, get_user_updates, get_user, get_all_usernames, get_edit_permission, set_edit_permission, clear_week_data_for_user, clear_user_data, clear_all_data, clear_week_data_for_all, get_user_id, get_all_updates, get_all_users, add_user, update_user, reset_password, delete_user
-from auth.auth import init_session_state, login, logout
-from pages.student_dashboard import show_student_submission
-from pages.admin_dashboard import show_admin_dashboard
-from pages.user_updates import show_user_updates
-from pages.messenger import show_messenger
+from db.database import ensure_db, get_user_updates, get_user, get_admin_usernames, get_weeks, set_course_length, update_week, set_all_weeks_locked, clear_week_data_for_user, clear_user_data, clear_all_data, clear_week_data_for_all, get_user_id, get_distinct_weeks, add_user, update_user, reset_password, delete_user, bulk_add_users, search_students, clear_data, CLEAR_TABLES, STUDENT_USERNAME_PATTERN, STUDENT_PAGE_SIZE
+from auth.auth import init_session_state, login, logout, current_user, refresh_session
+from db.cache import request_scope
+from db.profiling import section, start_metrics_server, trace_rerun
+from db.hashing import HashingBusy
 import re
 
+# page -> (module, function, role allowed to open it or None for any, heading).
+# Page modules, and pandas with them, are only imported once a session first
+# routes to the page, so a cold start serves the login page without them.
+PAGES = {
+    "student_dashboard": ("pages.student_dashboard", "show_student_submission", "Student", "Student Dashboard"),
+    "admin_dashboard": ("pages.admin_dashboard", "show_admin_dashboard", "Admin", "Admin Dashboard"),
+    "user_updates": ("pages.user_updates", "show_user_updates", "Admin", None),
+    "messenger": ("pages.messenger", "show_messenger", None, None),
+}
+
+def load_page(page):
+    """Return the function that draws a page, importing its module on first use."""
+    module, function, _, _ = PAGES[page]
+    return getattr(importlib.import_module(module), function)
+
 def apply_theme():
     theme = 'dark'
     primary = '#60a5fa'  # Lighter blue for dark mode
@@ -57,14 +71,17 @@ def show_login_page():
             if role == "Student":
                 if st.button("Register 🎓", key="register_button", help="Register a new student account"):
                     if re.match(r'^AIE230(0[1-9]|[1-9][0-9]|1[0-5][0-7])$', username) and len(password) >= 8:
-                        if add_user(username, password, "Student"):
-                            st.success(f"Student {username} registered successfully! Redirecting to dashboard...")
-                            # Automatically log in the user and redirect
-                            if login(username, password):
-                                st.session_state.page = "student_dashboard"
-                                st.rerun()
-                        else:
-                            st.error("Username already exists or invalid format.")
+                        try:
+                            if add_user(username, password, "Student"):
+                                st.success(f"Student {username} registered successfully! Redirecting to dashboard...")
+                                # Automatically log in the user and redirect
+                                if login(username, password):
+                                    st.session_state.page = "student_dashboard"
+                                    st.rerun()
+                            else:
+                                st.error("Username already exists or invalid format.")
+                        except HashingBusy as e:
+                            st.error(str(e))
                     else:
                         st.error("Username must be AIE23xxx (001-157) and password must be at least 8 characters.")
             else:
@@ -76,16 +93,23 @@ def show_login_page():
                     actual_role = user[3]
                     if actual_role != role:
                         st.error(f"You are trying to log in as a {role}, but this account is a {actual_role}.")
-                    elif login(username, password):
-                        st.success("Logged in successfully!")
-                        st.session_state.page = "student_dashboard" if role == "Student" else "admin_dashboard"
-                        st.rerun()
                     else:
-                        st.error("Invalid credentials")
+                        try:
+                            logged_in = login(username, password)
+                        except HashingBusy as e:
+                            st.error(str(e))
+                        else:
+                            if logged_in:
+                                st.success("Logged in successfully!")
+                                st.session_state.page = "student_dashboard" if role == "Student" else "admin_dashboard"
+                                st.rerun()
+                            else:
+                                st.error("Invalid credentials")
                 else:
                     st.error("Invalid credentials")
         st.markdown('</div>', unsafe_allow_html=True)
 
+@section("show_sidebar")
 def show_sidebar():
     """Display sidebar content based on user role with enhanced UI."""
     if st.session_state.get("logged_in", False):
@@ -97,24 +121,37 @@ def show_sidebar():
         st.sidebar.markdown(f'<h4 style="color: #1e40af; text-align: center;">Hello {st.session_state.username}</h4>', unsafe_allow_html=True)
         st.sidebar.markdown('<hr style="border: 1px solid #4a5568;">', unsafe_allow_html=True)
         with st.sidebar.expander("Student List 🔍", expanded=True):
-            search_query = st.text_input("Search Students", placeholder="Enter username...", key="admin_search_users")
-            usernames = get_all_usernames()
-            usernames = sorted(usernames)  # Ensure sorted order
-            if search_query:
-                usernames = [username for username in usernames if search_query.lower() in username.lower()]
-                usernames = sorted(usernames)  # Sort after filtering
+            search_query = st.text_input("Search Students", placeholder="Enter username...", key="admin_search_users",
+                                         on_change=lambda: st.session_state.update(student_list_page=0))
+            # Only one page of matching students is queried and drawn per rerun.
+            page = st.session_state.get("student_list_page", 0)
+            usernames, total = search_students(search_query, page * STUDENT_PAGE_SIZE, STUDENT_PAGE_SIZE)
+            if not usernames and page:
+                page = st.session_state.student_list_page = 0
+                usernames, total = search_students(search_query, 0, STUDENT_PAGE_SIZE)
             for username in usernames:
-                if st.sidebar.button(f"{username} 👤", key=f"sidebar_{username}", help=f"View {username}'s updates"):
+                if st.button(f"{username} 👤", key=f"sidebar_{username}", help=f"View {username}'s updates"):
                     st.session_state.selected_user = username
                     st.session_state.page = "user_updates"
                     st.rerun()
+            page_count = max(1, -(-total // STUDENT_PAGE_SIZE))
+            if page_count > 1:
+                col_prev, col_info, col_next = st.columns([1, 2, 1])
+                if col_prev.button("◀", key="student_list_prev", disabled=page == 0):
+                    st.session_state.student_list_page = page - 1
+                    st.rerun()
+                col_info.caption(f"Page {page + 1} of {page_count} · {total} students")
+                if col_next.button("▶", key="student_list_next", disabled=page >= page_count - 1):
+                    st.session_state.student_list_page = page + 1
+                    st.rerun()
     elif st.session_state.role == "Student":
-        user = get_user(st.session_state.username)
+        user = current_user()
         if user:
             user_id = user[0]
             updates = get_user_updates(user_id)
             with st.sidebar.expander("Your Updates 📋", expanded=True):
                 if updates:
+                    import pandas as pd
                     df = pd.DataFrame(updates, columns=["Week", "Content", "Timestamp"])
                     st.dataframe(df.style.set_properties(**{'background-color': '#2d3748', 'color': '#f7fafc', 'border-color': '#4a5568'}).set_table_styles([{'selector': 'tr:nth-child(even)', 'props': [('background-color', '#1a202c')]}]))
                 else:
@@ -126,29 +163,72 @@ def show_sidebar():
                 confirm_pw = st.text_input("Confirm New Password", type="password", key="student_confirm_pw")
                 if st.button("Update Password", key="student_update_pw_btn"):
                     from db.database import verify_password
-                    if not verify_password(current_pw, user[2]):
-                        st.error("Current password is incorrect.")
-                    elif len(new_pw) < 8:
-                        st.error("New password must be at least 8 characters.")
-                    elif new_pw != confirm_pw:
-                        st.error("New passwords do not match.")
-                    else:
-                        update_user(st.session_state.username, st.session_state.username, new_pw)
-                        st.success("Password updated successfully!")
+                    try:
+                        if not verify_password(current_pw, get_user(st.session_state.username)[2]):
+                            st.error("Current password is incorrect.")
+                        elif len(new_pw) < 8:
+                            st.error("New password must be at least 8 characters.")
+                        elif new_pw != confirm_pw:
+                            st.error("New passwords do not match.")
+                        else:
+                            update_user(st.session_state.username, st.session_state.username, new_pw)
+                            refresh_session()
+                            st.success("Password updated successfully!")
+                    except HashingBusy as e:
+                        st.error(str(e))
+def show_course_weeks():
+    """Sidebar editor for the course length, week windows and per-week locks."""
+    weeks = get_weeks()
+    with st.sidebar.expander("Course Weeks 📅", expanded=False):
+        total_weeks = st.number_input("Number of weeks", min_value=1, max_value=52, value=max(len(weeks), 1), step=1, key="course_length")
+        if total_weeks != len(weeks) and st.button("Apply Course Length", key="apply_course_length"):
+            set_course_length(int(total_weeks))
+            st.rerun()
+        st.caption("Locked weeks accept new submissions but not changes to submitted ones.")
+        col_lock, col_unlock = st.columns(2)
+        if col_lock.button("Lock All", key="lock_all_weeks"):
+            set_all_weeks_locked(True)
+            st.rerun()
+        if col_unlock.button("Unlock All", key="unlock_all_weeks"):
+            set_all_weeks_locked(False)
+            st.rerun()
+        import pandas as pd
+        df = pd.DataFrame(weeks, columns=["Week", "Opens", "Closes", "Locked"])
+        df["Opens"] = pd.to_datetime(df["Opens"]).dt.date
+        df["Closes"] = pd.to_datetime(df["Closes"]).dt.date
+        df["Locked"] = df["Locked"].astype(bool)
+        edited = st.data_editor(df, key="weeks_editor", hide_index=True, disabled=["Week"],
+                                column_config={"Opens": st.column_config.DateColumn(), "Closes": st.column_config.DateColumn()})
+        if st.button("Save Weeks", key="save_weeks"):
+            iso = lambda d: d.isoformat() if pd.notna(d) else None
+            for old, (week, opens, closes, locked) in zip(weeks, edited.itertuples(index=False)):
+                new = (int(week), iso(opens), iso(closes), int(locked))
+                if new != tuple(old):
+                    update_week(*new)
+            st.success("Weeks updated!")
+            st.rerun()
+
+def user_picker(label, key, admins=False):
+    """Search box plus a selectbox over the first page of matching students (and admins)."""
+    query = st.sidebar.text_input(f"Search {label}", placeholder="Enter username...", key=f"{key}_search")
+    usernames, total = search_students(query, 0, STUDENT_PAGE_SIZE)
+    if total > len(usernames):
+        st.sidebar.caption(f"Showing {len(usernames)} of {total} students, type more to narrow down.")
+    if admins:
+        usernames = [name for name in get_admin_usernames() if query.strip().lower() in name.lower()] + usernames
+    return st.sidebar.selectbox(label, [""] + usernames, key=key)
+
 #workin
+@section("show_admin_controls")
 def show_admin_controls():
     """Display admin controls in the sidebar with granular clearing options and user management."""
     if st.session_state.role == "Admin":
         st.sidebar.markdown('<hr style="border: 1px solid #4a5568;">', unsafe_allow_html=True)
         st.sidebar.subheader("Admin Controls ⚙️")
-        allow_edits = get_edit_permission()
-        if st.sidebar.button("Allow Edits to Students" if not allow_edits else "Disable Edits to Students", key="toggle_edits"):
-            set_edit_permission(1 if not allow_edits else 0)
-            st.sidebar.success("Edit permission updated!")
-            st.rerun()
+        show_course_weeks()
         
         # Week-wise clear for a user
-        selected_user = st.sidebar.selectbox("Select User", [""] + get_all_usernames(), key="clear_user")
+        selected_user = user_picker("Select User", "clear_user")
         if selected_user:
             user_id = get_user_id(selected_user)
             updates = get_user_updates(user_id) if user_id else []
@@ -173,7 +253,8 @@ def show_admin_controls():
             st.session_state.show_clear_all_confirm = True
         if st.session_state.get("show_clear_all_confirm", False):
             with st.sidebar:
-                st.warning("Are you sure you want to delete ALL user data? This action cannot be undone.")
+                pending = clear_data(dry_run=True)["updates"]
+                st.warning(f"Are you sure you want to delete ALL user data ({pending} updates)? This action cannot be undone.")
                 col1, col2 = st.columns([1,1])
                 with col1:
                     if st.button("Cancel", key="cancel_clear_all"):
@@ -186,8 +267,7 @@ def show_admin_controls():
                         st.rerun()
         
         # Clear particular week data for all users
-        all_weeks = [update[1] for update in get_all_updates()] if get_all_updates() else []
-        selected_all_week = st.sidebar.selectbox("Select Week to Clear for All", [""] + sorted(set(all_weeks)), key="clear_all_week")
+        selected_all_week = st.sidebar.selectbox("Select Week to Clear for All", [""] + get_distinct_weeks(), key="clear_all_week")
         if st.sidebar.button("Clear Week Data for All 🗑️", key="clear_all_week_data", help="Clear data for selected week across all users"):
             if selected_all_week:
                 clear_week_data_for_all(selected_all_week)
@@ -204,28 +284,37 @@ def show_admin_controls():
             new_role = st.selectbox("Role", ["Student", "Admin"], key="sidebar_admin_new_role")
             if st.button("Add User ➕", key="sidebar_add_user_btn", help="Add a new user"):
                 if new_username and new_password:
-                    if add_user(new_username, new_password, new_role):
-                        st.success("User added successfully!")
-                    else:
-                        st.error("Username already exists")
+                    try:
+                        if add_user(new_username, new_password, new_role):
+                            st.success("User added successfully!")
+                        else:
+                            st.error("Username already exists")
+                    except HashingBusy as e:
+                        st.error(str(e))
                 else:
                     st.error("Please fill all fields")
-        users = get_all_users()
-        selected_username = st.sidebar.selectbox("Select User to Manage", [""] + [user[1] for user in users], key="manage_user")
+        selected_username = user_picker("Select User to Manage", "manage_user", admins=True)
         if selected_username:
-            user = next((u for u in users if u[1] == selected_username), None)
+            user = get_user(selected_username)
             if user:
                 new_username = st.sidebar.text_input("New Username", value=user[1], key=f"new_username_{user[0]}")
                 new_password = st.sidebar.text_input("New Password", type="password", value="", key=f"new_password_{user[0]}")
                 if st.sidebar.button("Update User 📝", key=f"update_user_{user[0]}", help="Update username and/or password"):
                     if new_username and (new_password or get_user(selected_username)[2]):
-                        update_user(selected_username, new_username, new_password if new_password else None)
-                        st.sidebar.success(f"User {selected_username} updated to {new_username}!")
-                        st.rerun()
+                        try:
+                            update_user(selected_username, new_username, new_password if new_password else None)
+                        except HashingBusy as e:
+                            st.sidebar.error(str(e))
+                        else:
+                            st.sidebar.success(f"User {selected_username} updated to {new_username}!")
+                            st.rerun()
                 if st.sidebar.button("Delete User ❌", key=f"delete_user_{user[0]}", help="Delete this user"):
                     st.session_state[f"show_delete_user_confirm_{user[0]}"] = True
                 if st.session_state.get(f"show_delete_user_confirm_{user[0]}", False):
-                    st.warning(f"Are you sure you want to delete user {selected_username}? This action cannot be undone.")
+                    pending = clear_data([user[0]], tables=CLEAR_TABLES, dry_run=True)
+                    st.warning(f"Are you sure you want to delete user {selected_username}? This also removes "
+                               f"{pending['updates']} updates, {pending['group_messages']} group messages and "
+                               f"{pending['private_messages']} private messages. This action cannot be undone.")
                     col1, col2 = st.columns([1,1])
                     with col1:
                         if st.button("Cancel", key=f"cancel_delete_user_{user[0]}"):
@@ -241,69 +330,75 @@ def show_admin_controls():
             st.write("Upload a CSV file with columns: username,password")
             csv_file = st.file_uploader("Choose CSV file", type=["csv"], key="bulk_add_csv")
             if csv_file is not None:
+                import pandas as pd
                 df = pd.read_csv(csv_file)
                 if not set(["username", "password"]).issubset(df.columns):
                     st.error("CSV must have columns: username, password")
                 else:
-                    results = []
-                    for i, row in df.iterrows():
-                        uname = str(row["username"]).strip()
-                        pw = str(row["password"]).strip()
-                        if re.match(r'^AIE230(0[1-9]|[1-9][0-9]|1[0-5][0-7])$', uname) and len(pw) >= 8:
-                            if add_user(uname, pw, "Student"):
-                                results.append((uname, "Success"))
-                            else:
-                                results.append((uname, "Already exists or invalid"))
-                        else:
-                            results.append((uname, "Invalid format or password too short"))
+                    usernames = df["username"].astype(str).str.strip()
+                    passwords = df["password"].astype(str).str.strip()
+                    valid = usernames.str.match(STUDENT_USERNAME_PATTERN) & (passwords.str.len() >= 8)
+                    statuses = pd.Series("Invalid format or password too short", index=df.index)
+                    if valid.any():
+                        progress_bar = st.progress(0.0, text="Hashing passwords...")
+                        added = bulk_add_users(list(zip(usernames[valid], passwords[valid])), "Student",
+                                               progress=lambda done, total: progress_bar.progress(done / total, text=f"Hashed {done}/{total} passwords"))
+                        statuses[valid] = [status for _, status in added]
+                        progress_bar.empty()
+                    results = zip(usernames, statuses)
                     st.write("### Bulk Add Results:")
                     for uname, status in results:
                         st.write(f"{uname}: {status}")
 
+@section("show_main_content")
 def show_main_content():
     """Display main content based on page and role with greeting."""
     page = st.session_state.get("page", "login")
     with st.container():
         if page == "login" or not st.session_state.logged_in:
             show_login_page()
-        elif page == "student_dashboard" and st.session_state.role == "Student":
-            st.markdown(f"<h1 style='color: #1e40af; text-align: center;'>Student Dashboard - Hello {st.session_state.username}</h1>", unsafe_allow_html=True)
-            st.markdown('<hr style="border: 1px solid #4a5568;">', unsafe_allow_html=True)
-            show_student_submission()
-        elif page == "admin_dashboard" and st.session_state.role == "Admin":
-            st.markdown(f"<h1 style='color: #1e40af; text-align: center;'>Admin Dashboard - Hello {st.session_state.username}</h1>", unsafe_allow_html=True)
+            return
+        if page not in PAGES:
+            return
+        _, _, role, heading = PAGES[page]
+        if role not in (None, st.session_state.role):
+            return
+        if heading:
+            st.markdown(f"<h1 style='color: #1e40af; text-align: center;'>{heading} - Hello {st.session_state.username}</h1>", unsafe_allow_html=True)
             st.markdown('<hr style="border: 1px solid #4a5568;">', unsafe_allow_html=True)
-            show_admin_dashboard()
-        elif page == "user_updates" and st.session_state.role == "Admin":
-            show_user_updates()
-        elif page == "messenger":
-            show_messenger()
+        load_page(page)()
 
 def main():
     """Main Streamlit app function."""
-    apply_theme()
-    init_db()
-    init_session_state()
-    show_sidebar()
-    show_admin_controls()
-    show_main_content()
+    start_metrics_server()
+    with request_scope(), trace_rerun(st.session_state.get("page", "login")):
+        apply_theme()
+        ensure_db()
+        with section("init_session_state"):
+            init_session_state()
+        show_sidebar()
+        show_admin_controls()
+        show_main_content()
+        if st.session_state.role == "Admin":
+            from ui.perf import show_perf_panel
+            show_perf_panel()
     
-    # Logout button in sidebar
-    if st.session_state.logged_in and st.sidebar.button("Logout 🚪", help="Click to log out"):
-        st.session_state.show_logout_confirm = True
-    if st.session_state.get("show_logout_confirm", False):
-        with st.sidebar:
-            st.warning("Are you sure you want to logout?")
-            col1, col2 = st.columns([1,1])
-            with col1:
-                if st.button("Cancel", key="cancel_logout"):
-                    st.session_state.show_logout_confirm = False
-            with col2:
-                if st.button("Logout", key="confirm_logout", type="primary"):
-                    logout()
-                    st.session_state.page = "login"
-                    st.session_state.show_logout_confirm = False
-                    st.rerun()
+        # Logout button in sidebar
+        if st.session_state.logged_in and st.sidebar.button("Logout 🚪", help="Click to log out"):
+            st.session_state.show_logout_confirm = True
+        if st.session_state.get("show_logout_confirm", False):
+            with st.sidebar:
+                st.warning("Are you sure you want to logout?")
+                col1, col2 = st.columns([1,1])
+                with col1:
+                    if st.button("Cancel", key="cancel_logout"):
+                        st.session_state.show_logout_confirm = False
+                with col2:
+                    if st.button("Logout", key="confirm_logout", type="primary"):
+                        logout()
+                        st.session_state.page = "login"
+                        st.session_state.show_logout_confirm = False
+                        st.rerun()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
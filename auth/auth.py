@@ -1,5 +1,32 @@
 import streamlit as st
-from db.database import get_user, verify_password
+import streamlit.components.v1 as components
+from db.database import get_user, verify_password, reset_password
+from db.hashing import needs_rehash
+from auth.sessions import SESSION_TTL, start_session, resolve_session, end_session
+
+SESSION_COOKIE = "portal_session"
+
+def _read_session_cookie():
+    """The session token from the browser's cookie, if any (AppTest has no real cookies)."""
+    token = st.context.cookies.get(SESSION_COOKIE)
+    return token if isinstance(token, str) and token else None
+
+def _write_session_cookie(token):
+    """Set (or with None, delete) the session cookie from the browser.
+
+    Streamlit can only read cookies, so a zero-height component writes it. The
+    token stays out of the URL, where links, history and Referer headers leak it.
+    """
+    value, max_age = (token, SESSION_TTL) if token else ("", 0)
+    script = f"""<script>
+        const secure = window.parent.location.protocol === "https:" ? "; Secure" : "";
+        window.parent.document.cookie = "{SESSION_COOKIE}={value}; Path=/; Max-Age={max_age}; SameSite=Strict" + secure;
+        </script>"""
+    # Newer Streamlit deprecates components.html in favour of st.iframe (height >= 1).
+    if hasattr(st, "iframe"):
+        st.iframe(script, height=1)
+    else:
+        components.html(script, height=0)
 
 def init_session_state():
     """Initialize session state variables if not present."""
@@ -11,19 +38,71 @@ def init_session_state():
         st.session_state.role = None
     if 'page' not in st.session_state:
         st.session_state.page = "login"
+    if 'session_token' not in st.session_state:
+        # Read once per browser session: the cookie header only changes on reconnect.
+        st.session_state.session_token = _read_session_cookie()
+    if st.session_state.session_token:
+        restore_session()
+    if 'session_cookie' in st.session_state:
+        _write_session_cookie(st.session_state.pop('session_cookie'))
+
+def restore_session():
+    """Sync login state with the server-side session, e.g. after a reconnect."""
+    record = resolve_session(st.session_state.session_token)
+    if record is None:
+        logout()
+        return
+    user_id, username, role = record[:3]
+    if not st.session_state.logged_in:
+        st.session_state.page = "student_dashboard" if role == "Student" else "admin_dashboard"
+    st.session_state.logged_in = True
+    st.session_state.username = username
+    st.session_state.role = role
+
+def current_user():
+    """Return (user_id, username, role) for the logged-in user without a password check."""
+    if st.session_state.get("session_token"):
+        record = resolve_session(st.session_state.session_token)
+        return record[:3] if record else None
+    user = get_user(st.session_state.get("username"))
+    return (user[0], user[1], user[3]) if user else None
+
+def refresh_session():
+    """Replace the current session after the user changed their own password."""
+    user = get_user(st.session_state.username)
+    if st.session_state.get("session_token"):
+        end_session(st.session_state.session_token)
+    if user:
+        st.session_state.session_token = st.session_state.session_cookie = start_session(user)
+
+def authenticate(username, password):
+    """Return the user row if the password matches, upgrading an outdated hash."""
+    user = get_user(username)
+    if not (user and verify_password(password, user[2])):
+        return None
+    if needs_rehash(user[2]):
+        reset_password(username, password)
+        user = get_user(username)
+    return user
 
 def login(username, password):
     """Handle user login authentication."""
-    user = get_user(username)
-    if user and verify_password(password, user[2]):
+    user = authenticate(username, password)
+    if user:
         st.session_state.logged_in = True
         st.session_state.username = username
         st.session_state.role = user[3]
+        st.session_state.session_token = st.session_state.session_cookie = start_session(user)
         return True
     return False
 
 def logout():
     """Handle user logout."""
+    if st.session_state.get("session_token"):
+        end_session(st.session_state.session_token)
+    if st.session_state.get("session_token") or _read_session_cookie():
+        st.session_state.session_cookie = None
+    st.session_state.session_token = None
     st.session_state.logged_in = False
     st.session_state.username = None
-    st.session_state.role = None
\ No newline at end of file
+    st.session_state.role = None
@@ -0,0 +1,47 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from db.cache import DEFAULT_TTL, get_generation
+from db.database import create_session, get_session_user, delete_session
+
+SESSION_TTL = 7 * 24 * 3600
+LRU_SIZE = 1024
+
+# token -> (users cache generation, refresh deadline, session record). Any change
+# to the users table bumps the generation, so a renamed user or changed password
+# is picked up on the next lookup without a per-user invalidation list. The
+# generation is per process, so entries are also re-read after DEFAULT_TTL to
+# catch logouts and password changes made through other replicas.
+_lock = threading.Lock()
+_lru = OrderedDict()
+
+def start_session(user):
+    """Create a session for a (user_id, username, password_hash, role) row and return its token."""
+    return create_session(user[0], user[2], SESSION_TTL)
+
+def resolve_session(token):
+    """Return (user_id, username, role, hash_version, expires_at) for a live session, else None."""
+    generation = get_generation("users")
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with _lock:
+        entry = _lru.get(token)
+        if entry and entry[0] == generation and entry[1] > time.monotonic() and entry[2][4] > now:
+            _lru.move_to_end(token)
+            return entry[2]
+    deadline = time.monotonic() + DEFAULT_TTL
+    record = get_session_user(token)
+    with _lock:
+        if record is None:
+            _lru.pop(token, None)
+        else:
+            _lru[token] = (generation, deadline, record)
+            _lru.move_to_end(token)
+            while len(_lru) > LRU_SIZE:
+                _lru.popitem(last=False)
+    return record
+
+def end_session(token):
+    delete_session(token)
+    with _lock:
+        _lru.pop(token, None)
@@ -0,0 +1,50 @@
+"""Run the db function and page benchmarks and append one JSON line with the results.
+
+Each line records the commit, the dataset size and the Python and SQLite
+versions next to the numbers, so results from different commits can be
+compared, e.g. with jq or pandas.read_json(path, lines=True).
+
+Usage: python -m benchmarks [students] [--output results.jsonl]
+"""
+import json
+import platform
+import sqlite3
+import subprocess
+import sys
+from datetime import datetime
+
+from benchmarks import db_functions, pages
+
+RESULTS = "benchmark_results.jsonl"
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    args = sys.argv[1:]
+    output = RESULTS
+    if "--output" in args:
+        i = args.index("--output")
+        output = args[i + 1]
+        del args[i:i + 2]
+    students = int(args[0]) if args else 150
+    functions, missing = db_functions.run(students)
+    page_results = pages.run(students)
+    record = {"time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "commit": git_commit(), "students": students,
+              "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+              "db_functions": functions, "pages": page_results, "unbenchmarked": missing}
+    with open(output, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+    for label, r in page_results.items():
+        print(f"  {label:<22} {r['median_ms']:8.1f} ms per rerun")
+    slow = sorted(functions.items(), key=lambda item: item[1]["median_us"], reverse=True)[:5]
+    print("  slowest db functions: " + ", ".join(f"{name} {r['median_us'] / 1000:.1f} ms" for name, r in slow))
+    if missing:
+        print("  no benchmark for: " + ", ".join(missing))
+    print(f"{len(functions)} functions and {len(page_results)} pages at {students} students appended to {output}")
+
+if __name__ == "__main__":
+    main()
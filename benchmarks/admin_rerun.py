@@ -0,0 +1,88 @@
+"""Time the database calls made by one admin dashboard rerun.
+
+Compares the pooled connection layer plus the once-per-process ensure_db()
+against running init_db() on every rerun and opening a fresh connection per
+call, which is what app.py and db/database.py used to do.
+
+Usage: python -m benchmarks.admin_rerun [reruns]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+from benchmarks.data import generate
+from db import connection, database
+from db.cache import get_cache_stats, request_scope
+
+STUDENTS = 150
+WEEKS = 10
+
+def seed(path):
+    """Create a database with a full cohort and one update per student per week."""
+    connection.set_db_path(path)
+    generate(STUDENTS, WEEKS, 0, 0, submit_rate=1.0)
+
+def admin_rerun(bootstrap):
+    """Issue the reads app.main() originally made on the admin dashboard page."""
+    bootstrap()
+    database.get_all_usernames()                                  # show_sidebar
+    database.get_weeks()                                          # show_admin_controls
+    database.get_all_usernames()
+    [u[1] for u in database.get_all_updates()] if database.get_all_updates() else []
+    database.get_all_users()
+    database.get_all_users()                                      # show_admin_dashboard
+    database.get_all_updates()
+
+def current_admin_rerun(bootstrap):
+    """Issue the reads app.main() makes today, inside one request scope."""
+    with request_scope():
+        bootstrap()
+        database.search_students("", 0, database.STUDENT_PAGE_SIZE)  # show_sidebar
+        database.get_weeks()                                      # show_admin_controls
+        database.search_students("", 0, database.STUDENT_PAGE_SIZE)
+        database.get_distinct_weeks()
+        database.get_admin_usernames()
+        database.get_submission_stats(WEEKS)                      # show_admin_dashboard
+        database.get_week_submitters(1)
+
+@contextmanager
+def unpooled_connection():
+    """The pre-pool behaviour: one fresh connection per call."""
+    conn = sqlite3.connect(connection.DB_PATH)
+    try:
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+def timed(reruns, bootstrap, rerun=admin_rerun):
+    start = time.perf_counter()
+    for _ in range(reruns):
+        rerun(bootstrap)
+    return (time.perf_counter() - start) / reruns * 1000
+
+def main():
+    reruns = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with tempfile.TemporaryDirectory() as tmp:
+        seed(os.path.join(tmp, "bench.db"))
+        pooled = database.get_connection
+        database.get_connection = unpooled_connection
+        try:
+            before = timed(reruns, database.init_db)
+        finally:
+            database.get_connection = pooled
+        after = timed(reruns, database.ensure_db)
+        current = timed(reruns, database.ensure_db, current_admin_rerun)
+        stats = get_cache_stats()
+        connection.close_all()
+    print(f"admin rerun, {STUDENTS} students x {WEEKS} weeks, {reruns} reruns")
+    print(f"  init_db + fresh connection per call: {before:8.2f} ms/rerun")
+    print(f"  ensure_db + pooled connections:      {after:8.2f} ms/rerun ({before / after:.1f}x)")
+    print(f"  current reads, per-rerun cache:      {current:8.2f} ms/rerun ({before / current:.1f}x)")
+    print(f"  shared cache: {stats['hits']} hits, {stats['misses']} misses")
+
+if __name__ == "__main__":
+    main()
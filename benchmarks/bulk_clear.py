@@ -0,0 +1,74 @@
+"""Measure how long a large clear blocks other writers, one DELETE vs clear_data().
+
+While the clear runs, a second thread keeps submitting updates and records
+its worst write latency. Also reports the database size before and after.
+
+Usage: python -m benchmarks.bulk_clear [students]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.data import generate
+from db import connection, database
+
+WEEKS = 10
+
+def seed(path, students):
+    """Every student submits every week; one extra student is left for the writer."""
+    connection.set_db_path(path)
+    data = generate(students + 1, WEEKS, 0, 0, submit_rate=1.0)
+    with connection.get_connection() as conn:
+        conn.execute("DELETE FROM updates WHERE user_id = ?", (data["student_ids"][-1],))
+    connection.close_all()
+    return data["student_ids"]
+
+def single_delete():
+    """What clear_all_data() used to do."""
+    with connection.get_connection() as conn:
+        conn.execute("DELETE FROM updates WHERE user_id != ?", (WRITER_ID,))
+
+def chunked_clear():
+    database.clear_data(user_ids=[user_id for user_id in STUDENT_IDS if user_id != WRITER_ID])
+
+def run(path, students, clear):
+    global STUDENT_IDS, WRITER_ID
+    STUDENT_IDS = seed(path, students)
+    WRITER_ID = STUDENT_IDS[-1]
+    size_before = os.path.getsize(path)
+    stop = threading.Event()
+    latencies = []
+
+    def writer():
+        week = 0
+        while not stop.is_set():
+            start = time.perf_counter()
+            database.upsert_update(WRITER_ID, week % WEEKS + 1, f"tick {week}")
+            latencies.append(time.perf_counter() - start)
+            week += 1
+            time.sleep(0.005)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    time.sleep(0.05)
+    start = time.perf_counter()
+    clear()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    thread.join()
+    connection.close_all()
+    return elapsed * 1000, max(latencies) * 1000, len(latencies), size_before, os.path.getsize(path)
+
+def main():
+    students = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    print(f"clearing {students * WEEKS} updates while another session keeps submitting")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, clear in (("single DELETE", single_delete), ("clear_data()", chunked_clear)):
+            ms, worst, writes, before, after = run(os.path.join(tmp, f"{name[:6]}.db"), students, clear)
+            print(f"  {name:<14} {ms:8.0f} ms total  worst concurrent write {worst:7.1f} ms ({writes} writes)"
+                  f"  file {before / 2**20:.1f} -> {after / 2**20:.1f} MB")
+
+if __name__ == "__main__":
+    main()
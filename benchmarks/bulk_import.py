@@ -0,0 +1,60 @@
+"""Compare a per-row add_user() loop with bulk_add_users() for a CSV import.
+
+The import is timed twice: with hashing stubbed out, to isolate the database
+work, and with real bcrypt at cost 4, to show how hashing spreads over the
+available cores (bulk_add_users hashes in a thread pool).
+
+Usage: python -m benchmarks.bulk_import [rows ...]
+"""
+import os
+import re
+import sys
+import tempfile
+import time
+
+import bcrypt
+
+from db import connection, database, hashing
+
+def cheap_hash(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(4)).decode('utf-8')
+
+def no_hash(password, rounds):
+    return "stub$" + password
+
+def cohort(n):
+    """Return n (username, password) rows; only small cohorts fit the student pattern."""
+    if n <= 157:
+        students = [f"AIE230{i:02d}" for i in range(1, 200)]
+        return [(u, "password123") for u in students if re.match(database.STUDENT_USERNAME_PATTERN, u)][:n]
+    return [(f"user{i:05d}", "password123") for i in range(1, n + 1)]
+
+def run(path, rows, bulk):
+    connection.set_db_path(path)
+    database.ensure_db()
+    role = "Student" if rows[0][0].startswith("AIE") else "Admin"
+    start = time.perf_counter()
+    if bulk:
+        results = database.bulk_add_users(rows, role)
+    else:
+        results = [(u, "Success" if database.add_user(u, p, role) else "Failed") for u, p in rows]
+    elapsed = time.perf_counter() - start
+    assert all(status == "Success" for _, status in results)
+    return elapsed
+
+def main():
+    sizes = [int(n) for n in sys.argv[1:]] or [157, 1_000, 10_000]
+    print(f"{os.cpu_count()} cores")
+    print("rows      hashing        add_user loop   bulk_add_users")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            rows = cohort(n)
+            for label, hasher in (("stubbed", no_hash), ("bcrypt 4", cheap_hash)):
+                hashing._hash = hasher
+                loop = run(os.path.join(tmp, f"loop{n}{hasher.__name__}.db"), rows, bulk=False)
+                bulk = run(os.path.join(tmp, f"bulk{n}{hasher.__name__}.db"), rows, bulk=True)
+                print(f"{n:<9} {label:<14} {loop:10.3f} s   {bulk:10.3f} s  ({loop / bulk:.1f}x)")
+        connection.close_all()
+
+if __name__ == "__main__":
+    main()
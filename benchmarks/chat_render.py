@@ -0,0 +1,83 @@
+"""Compare the per-message chat loop with the batched renderer in ui/chat.py.
+
+Counts the elements and bytes of the Delta messages each approach would send
+to the browser, and times building them. Browser paint time is not measured.
+
+Usage: python -m benchmarks.chat_render [messages ...]
+"""
+import sys
+import time
+
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+from ui.chat import conversation_html
+
+USER = "AIE23001"
+# Streamlit widget ids are a hash plus the user key.
+WIDGET_ID = "$$ID-" + "0" * 32 + "-{}"
+
+def make_rows(count):
+    return [(i, f"AIE23{i % 157 + 1:03d}" if i % 3 else USER, f"message {i} " + "x" * 80, "2025-01-01 00:00:00", i % 7 == 0)
+            for i in range(1, count + 1)]
+
+def markdown(body):
+    msg = ForwardMsg()
+    msg.delta.new_element.markdown.body = body
+    msg.delta.new_element.markdown.allow_html = True
+    return msg
+
+def legacy_deltas(rows):
+    """One markdown bubble, one three-column row and up to two buttons per message."""
+    deltas = []
+    for msg_id, sender, content, timestamp, edited in rows:
+        is_self = sender == USER
+        deltas.append(markdown(f"""
+                <div style='display:flex; flex-direction:column; align-items:{'flex-end' if is_self else 'flex-start'}; margin-bottom:8px;'>
+                    <div style='background:{"#2563eb" if is_self else "#374151"}; color:#fff; padding:10px 16px; border-radius:12px; max-width:70%; box-shadow:0 2px 8px #0002;'>
+                        <b>{sender}</b><br>{content}
+                        <div style='font-size:0.8em; color:#d1d5db; text-align:{"right" if is_self else "left"};'>{timestamp}{' (edited)' if edited else ''}</div>
+                    </div>
+                </div>
+                """))
+        row = ForwardMsg()
+        row.delta.add_block.horizontal.gap = "small"
+        deltas.append(row)
+        for weight in (0.125, 0.125, 0.75):
+            column = ForwardMsg()
+            column.delta.add_block.column.weight = weight
+            deltas.append(column)
+        if is_self:
+            for label in ("Edit", "Delete"):
+                button = ForwardMsg()
+                button.delta.new_element.button.label = label
+                button.delta.new_element.button.id = WIDGET_ID.format(f"{label.lower()}_group_{msg_id}")
+                deltas.append(button)
+    return deltas
+
+def batched_deltas(rows):
+    """One markdown element for the whole window; actions live in one selectbox."""
+    deltas = [markdown(conversation_html(rows, USER, highlight="admin"))]
+    select = ForwardMsg()
+    select.delta.new_element.selectbox.label = "Message"
+    select.delta.new_element.selectbox.id = WIDGET_ID.format("group_action_select")
+    select.delta.new_element.selectbox.options.extend(f"{row[3]} · {row[2][:39]}…" for row in rows if row[1] == USER)
+    deltas.append(select)
+    return deltas
+
+def measure(build, rows):
+    start = time.perf_counter()
+    deltas = build(rows)
+    elapsed = (time.perf_counter() - start) * 1000
+    return len(deltas), sum(delta.ByteSize() for delta in deltas), elapsed
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 50_000]
+    print(f"{'messages':>8}  {'renderer':<8} {'elements':>9} {'payload':>12} {'build':>10}")
+    for count in sizes:
+        rows = make_rows(count)
+        for name, build in (("legacy", legacy_deltas), ("batched", batched_deltas)):
+            elements, size, ms = measure(build, rows)
+            print(f"{count:>8}  {name:<8} {elements:>9} {size / 1024:>9.0f} KB {ms:>7.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Cold start of app.py: the first run in a fresh interpreter, then warm login-page reruns.
+
+Each scenario runs in its own Python process so nothing is imported yet,
+which is what a newly started server or a redeploy sees. Reports the time to
+import streamlit, the first and warm rerun times, and which of the heavy or
+page modules the run loaded.
+
+Usage: python -m benchmarks.cold_start [students]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WATCHED = ["pandas", "plotly.graph_objects", "pages.student_dashboard", "pages.admin_dashboard",
+           "pages.user_updates", "pages.messenger", "ui.perf"]
+
+# Runs in the child process: argv is db path, page, username, role.
+CHILD = """
+import json, statistics, sys, time
+start = time.perf_counter()
+import streamlit
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter() - start
+from db import connection
+connection.set_db_path(sys.argv[1])
+page, username, role = sys.argv[2:5]
+at = AppTest.from_file("app.py", default_timeout=60)
+if username:
+    at.session_state["logged_in"] = True
+    at.session_state["username"] = username
+    at.session_state["role"] = role
+at.session_state["page"] = page
+start = time.perf_counter()
+at.run()
+first = time.perf_counter() - start
+assert not at.exception, at.exception
+times = []
+for _ in range(5):
+    start = time.perf_counter()
+    at.run()
+    times.append(time.perf_counter() - start)
+print(json.dumps({"import_ms": imported * 1000, "first_ms": first * 1000, "warm_ms": statistics.median(times) * 1000,
+                  "loaded": [name for name in %r if name in sys.modules]}))
+""" % (WATCHED,)
+
+def cold_run(path, page, username="", role=""):
+    out = subprocess.run([sys.executable, "-c", CHILD, path, page, username, role], cwd=ROOT,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def main():
+    students = int(sys.argv[1]) if len(sys.argv) > 1 else 150
+    sys.path.insert(0, ROOT)
+    from db import connection
+    from benchmarks.data import generate
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        connection.set_db_path(path)
+        data = generate(students)
+        connection.close_all()
+        for label, args in [("login", ("login",)),
+                            ("student_dashboard", ("student_dashboard", data["students"][0], "Student")),
+                            ("admin_dashboard", ("admin_dashboard", data["admins"][0], "Admin"))]:
+            r = cold_run(path, *args)
+            print(f"{label:<18} streamlit import {r['import_ms']:5.0f} ms  first run {r['first_ms']:6.0f} ms  "
+                  f"warm rerun {r['warm_ms']:5.0f} ms  loaded: {', '.join(r['loaded']) or '-'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Compare the admin dashboard's Python-side statistics with get_submission_stats().
+
+Usage: python -m benchmarks.dashboard_stats [students] [weeks]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.data import generate
+from db import connection, database
+
+def seed(path, students, weeks):
+    connection.set_db_path(path)
+    generate(students, weeks, 0, 0)
+
+def python_stats(total_weeks):
+    """What show_admin_dashboard used to compute from get_all_users() and get_all_updates()."""
+    users = database.get_all_users()
+    updates = database.get_all_updates()
+    week_student = {}
+    for username, week, content, timestamp in updates:
+        week_student.setdefault(int(week), set()).add(username)
+    student_weeks = {u[1]: set() for u in users if u[2] == "Student"}
+    for username, week, content, timestamp in updates:
+        if username in student_weeks:
+            student_weeks[username].add(int(week))
+    completed_all = sum(1 for weeks in student_weeks.values() if len(weeks) == total_weeks)
+    no_subs = [u for u, weeks in student_weeks.items() if not weeks]
+    week_one = [u for u, weeks in student_weeks.items() if 1 in weeks]
+    return {w: len(s) for w, s in sorted(week_student.items())}, completed_all, no_subs, week_one
+
+def sql_stats(total_weeks):
+    stats = database.get_submission_stats(total_weeks)
+    return stats["week_counts"], stats["completed_all"], stats["no_submissions"], database.get_week_submitters(1)
+
+def timed(fn, *args, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(*args)
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+def main():
+    students = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    weeks = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    with tempfile.TemporaryDirectory() as tmp:
+        seed(os.path.join(tmp, "bench.db"), students, weeks)
+        before, old = timed(python_stats, weeks)
+        after, new = timed(sql_stats, weeks)
+        connection.close_all()
+    assert old == new, "SQL statistics disagree with the Python computation"
+    print(f"dashboard statistics, {students} students x {weeks} weeks")
+    print(f"  get_all_updates() + Python sets: {before:9.2f} ms")
+    print(f"  get_submission_stats():          {after:9.2f} ms ({before / after:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Seeded synthetic data for benchmarks: a cohort, its weekly updates and chat history.
+
+The same arguments always produce the same rows, so timings from different
+commits are comparable. Works against whatever database db.connection points
+at; call it on an empty one.
+
+Usage: python -m benchmarks.data path/to/file.db [students] [weeks] [group messages] [private messages] [seed]
+"""
+import random
+import sys
+from datetime import datetime, timedelta
+
+from db import connection, database, hashing
+
+PASSWORD = "password123"
+ADMINS = 3
+# Share of (student, week) pairs with a submitted update.
+SUBMIT_RATE = 0.8
+WORDS = ("model training dataset accuracy loss epoch tuned baseline report notebook pipeline feature "
+         "regression classifier cluster embedding transformer attention kernel gradient batch "
+         "validation inference deploy docker api latency benchmark review meeting slides demo").split()
+
+def student_username(i):
+    """The i-th student's username: AIE23001 upwards, continuing as AIE24000 and so on past 999."""
+    i += 1
+    return f"AIE{23 + i // 1000}{i % 1000:03d}"
+
+def _text(rng, words):
+    return " ".join(rng.choices(WORDS, k=words))
+
+def generate(students=150, weeks=10, group_messages=500, private_messages=1000, seed=0, submit_rate=SUBMIT_RATE, rounds=4):
+    """Fill the current database and return what was created.
+
+    The result has the student and admin usernames, the student user ids in
+    the same order, and the number of weeks, updates and messages.
+
+    Every user's password is PASSWORD, hashed once at bcrypt cost rounds (cheap
+    by default). Updates cover submit_rate of all (student, week) pairs, and all
+    weeks are unlocked so resubmissions overwrite. Private messages mostly go
+    between a student and an admin, the rest between two students, and go
+    through add_private_message so conversations and unread counts are
+    consistent.
+    """
+    rng = random.Random(seed)
+    database.ensure_db()
+    database.set_course_length(weeks)
+    database.set_all_weeks_locked(False)
+    password_hash = hashing._hash(PASSWORD, rounds)
+    usernames = [student_username(i) for i in range(students)]
+    admins = [f"admin{i}" for i in range(1, ADMINS + 1)]
+    start = datetime(2025, 1, 6, 9, 0, 0)
+    stamp = lambda minutes: (start + timedelta(minutes=minutes)).strftime("%Y-%m-%d %H:%M:%S")
+    with connection.get_connection() as conn:
+        conn.executemany("INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)",
+                         [(name, password_hash, "Admin") for name in admins] +
+                         [(name, password_hash, "Student") for name in usernames])
+        ids = dict(conn.execute("SELECT username, user_id FROM users WHERE role = 'Student'").fetchall())
+        updates = [(ids[name], week, _text(rng, rng.randint(8, 40)), stamp(week * 7 * 24 * 60 + rng.randint(0, 10_000)))
+                   for name in usernames for week in range(1, weeks + 1) if rng.random() < submit_rate]
+        conn.executemany("INSERT INTO updates (user_id, week, content, timestamp) VALUES (?, ?, ?, ?)", updates)
+        conn.executemany("INSERT INTO group_messages (sender, content, timestamp) VALUES (?, ?, ?)",
+                         [(rng.choice(usernames + admins), _text(rng, rng.randint(3, 20)), stamp(i)) for i in range(group_messages)])
+        # One transaction for the whole loop: add_private_message joins this one.
+        for _ in range(private_messages):
+            student = rng.choice(usernames)
+            other = rng.choice(admins) if rng.random() < 0.7 or students < 2 else rng.choice(usernames)
+            if other == student:
+                continue
+            sender, receiver = (student, other) if rng.random() < 0.5 else (other, student)
+            database.add_private_message(sender, receiver, _text(rng, rng.randint(3, 20)))
+        sent = conn.execute("SELECT COUNT(*) FROM private_messages").fetchone()[0]
+    return {"students": usernames, "admins": admins, "student_ids": [ids[name] for name in usernames], "weeks": weeks,
+            "updates": len(updates), "group_messages": group_messages, "private_messages": sent}
+
+def main():
+    if len(sys.argv) < 2:
+        sys.exit(__doc__.strip().splitlines()[-1])
+    connection.set_db_path(sys.argv[1])
+    counts = [int(arg) for arg in sys.argv[2:7]]
+    data = generate(*counts)
+    connection.close_all()
+    print(f"{len(data['students'])} students, {len(data['admins'])} admins, {data['updates']} updates over {data['weeks']} weeks, "
+          f"{data['group_messages']} group and {data['private_messages']} private messages in {sys.argv[1]}")
+
+if __name__ == "__main__":
+    main()
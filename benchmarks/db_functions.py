@@ -0,0 +1,162 @@
+"""Micro-benchmarks for every public function in db/database.py.
+
+Each function runs against a generated dataset (benchmarks.data) with the
+shared read cache cleared before every call, so the numbers are the cost of a
+cache miss. Functions that wipe data run once, after everything else.
+Reports the median and 95th percentile per call and lists any public function
+without a case here.
+
+Usage: python -m benchmarks.db_functions [students]
+"""
+import itertools
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from db import connection, database
+from db.cache import clear_shared_cache
+from benchmarks.data import PASSWORD, generate
+
+# Stop repeating a case after this many calls or this much time.
+MAX_CALLS = 200
+MAX_SECONDS = 0.5
+
+def cases(data):
+    """Return (name, call, setup, once) for each function; setup runs untimed before every call."""
+    students, admins, ids = data["students"], data["admins"], data["student_ids"]
+    student, student_id, admin = students[0], ids[0], admins[0]
+    counter = itertools.count()
+    stored_hash = database.get_user(student)[2]
+    token = database.create_session(student_id, stored_hash, 3600)
+    last_group = lambda: database.get_group_messages_before(limit=1)[0][0]
+    last_private = lambda: database.get_private_messages_before(student, admin, limit=1)[0][0]
+    state = {}
+
+    def fresh_user():
+        name = f"zz{next(counter):06d}"
+        with connection.get_connection() as conn:
+            conn.execute("INSERT INTO users (username, password_hash, role) VALUES (?, ?, 'Admin')", (name, stored_hash))
+        return name
+
+    def unread_message():
+        database.add_private_message(student, admin, "unread")
+        return last_private()
+
+    def remember(key, setup):
+        return lambda: state.__setitem__(key, setup())
+
+    return [
+        ("ensure_db", database.ensure_db, None, False),
+        ("init_db", database.init_db, None, False),
+        ("get_startup_timing", database.get_startup_timing, None, False),
+        ("hash_password", lambda: database.hash_password(PASSWORD), None, False),
+        ("verify_password", lambda: database.verify_password(PASSWORD, stored_hash), None, False),
+        ("password_hash_version", lambda: database.password_hash_version(stored_hash), None, False),
+        ("get_user", lambda: database.get_user(student), None, False),
+        ("get_user_id", lambda: database.get_user_id(student), None, False),
+        ("get_all_users", database.get_all_users, None, False),
+        ("get_all_usernames", database.get_all_usernames, None, False),
+        ("get_admin_usernames", database.get_admin_usernames, None, False),
+        ("search_students, short", lambda: database.search_students("23", 0, database.STUDENT_PAGE_SIZE), None, False),
+        ("search_students", lambda: database.search_students("E231", 0, database.STUDENT_PAGE_SIZE), None, False),
+        ("add_user", lambda: database.add_user(f"zy{next(counter):06d}", PASSWORD, "Admin"), None, False),
+        ("bulk_add_users", lambda: database.bulk_add_users([(f"zx{next(counter):06d}", PASSWORD) for _ in range(10)], role="Admin"), None, False),
+        ("update_user", lambda: database.update_user(state["user"], state["user"], None), remember("user", fresh_user), False),
+        ("reset_password", lambda: database.reset_password(state["user"], PASSWORD), remember("user", fresh_user), False),
+        ("delete_user", lambda: database.delete_user(state["user"]), remember("user", fresh_user), False),
+        ("add_update", lambda: database.add_update(student_id, 1000 + next(counter), "extra"), None, False),
+        ("upsert_update", lambda: database.upsert_update(student_id, 1, "resubmitted"), None, False),
+        ("update_update", lambda: database.update_update(student_id, 1, "edited"), None, False),
+        ("get_user_updates", lambda: database.get_user_updates(student_id), None, False),
+        ("get_all_updates", database.get_all_updates, None, False),
+        ("get_submission_stats", lambda: database.get_submission_stats(data["weeks"]), None, False),
+        ("get_week_submitters", lambda: database.get_week_submitters(1), None, False),
+        ("get_distinct_weeks", database.get_distinct_weeks, None, False),
+        ("get_weeks", database.get_weeks, None, False),
+        ("set_course_length", lambda: database.set_course_length(data["weeks"]), None, False),
+        ("update_week", lambda: database.update_week(1, "2025-01-06", "2025-01-12", True), None, False),
+        ("set_all_weeks_locked", lambda: database.set_all_weeks_locked(True), None, False),
+        ("clear_data, dry run", lambda: database.clear_data(tables=database.CLEAR_TABLES, dry_run=True), None, False),
+        ("clear_week_data_for_user", lambda: database.clear_week_data_for_user(student_id, 2), None, False),
+        ("clear_user_data", lambda: database.clear_user_data(ids[1]), None, False),
+        ("reclaim_space", database.reclaim_space, None, False),
+        ("create_session", lambda: database.create_session(student_id, stored_hash, 3600), None, False),
+        ("get_session_user", lambda: database.get_session_user(token), None, False),
+        ("delete_session", lambda: database.delete_session(state["token"]),
+         remember("token", lambda: database.create_session(student_id, stored_hash, 3600)), False),
+        ("add_group_message", lambda: database.add_group_message(student, "hello"), None, False),
+        ("get_group_messages", database.get_group_messages, None, False),
+        ("get_group_messages_since", lambda: database.get_group_messages_since(state["id"] - 50), remember("id", last_group), False),
+        ("get_group_messages_before", lambda: database.get_group_messages_before(limit=50), None, False),
+        ("edit_group_message", lambda: database.edit_group_message(state["id"], "edited"), remember("id", last_group), False),
+        ("delete_group_message", lambda: database.delete_group_message(state["id"]), remember("id", last_group), False),
+        ("conversation_key", lambda: database.conversation_key(student, admin), None, False),
+        ("get_message_seq", database.get_message_seq, None, False),
+        ("get_group_message_changes", lambda: database.get_group_message_changes(state["seq"] - 100),
+         remember("seq", database.get_message_seq), False),
+        ("add_private_message", lambda: database.add_private_message(student, admin, "question"), None, False),
+        ("get_private_messages", lambda: database.get_private_messages(student, admin), None, False),
+        ("get_private_messages_since", lambda: database.get_private_messages_since(student, admin, state["id"] - 20),
+         remember("id", last_private), False),
+        ("get_private_messages_before", lambda: database.get_private_messages_before(student, admin, limit=50), None, False),
+        ("edit_private_message", lambda: database.edit_private_message(state["id"], "edited"), remember("id", last_private), False),
+        ("delete_private_message", lambda: database.delete_private_message(state["id"]), remember("id", last_private), False),
+        ("get_inbox", lambda: database.get_inbox(admin), None, False),
+        ("mark_conversation_read", lambda: database.mark_conversation_read(admin, student, state["id"]),
+         remember("id", unread_message), False),
+        ("get_private_message_changes", lambda: database.get_private_message_changes(student, admin, state["seq"] - 100),
+         remember("seq", database.get_message_seq), False),
+        ("search", lambda: database.search("transformer gradient"), None, False),
+        ("delete_all_private_messages_between", lambda: database.delete_all_private_messages_between(student, admin), None, True),
+        ("delete_all_group_messages", database.delete_all_group_messages, None, True),
+        ("clear_week_data_for_all", lambda: database.clear_week_data_for_all(3), None, True),
+        ("clear_data", lambda: database.clear_data(weeks=[4]), None, True),
+        ("clear_all_data", database.clear_all_data, None, True),
+    ]
+
+def public_functions():
+    return sorted(name for name, fn in vars(database).items()
+                  if callable(fn) and not name.startswith("_") and getattr(fn, "__module__", None) == database.__name__)
+
+def measure(call, setup, once):
+    """Return per-call times in microseconds."""
+    times = []
+    deadline = time.perf_counter() + MAX_SECONDS
+    while not times or (not once and len(times) < MAX_CALLS and time.perf_counter() < deadline):
+        if setup:
+            setup()
+        clear_shared_cache()
+        start = time.perf_counter()
+        call()
+        times.append((time.perf_counter() - start) * 1e6)
+    return times
+
+def run(students=150):
+    """Benchmark every case on a fresh generated database; return {name: {"median_us", "p95_us", "calls"}}."""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        connection.set_db_path(os.path.join(tmp, "bench.db"))
+        data = generate(students)
+        all_cases = cases(data)
+        for name, call, setup, once in all_cases:
+            times = sorted(measure(call, setup, once))
+            results[name] = {"median_us": round(statistics.median(times), 1),
+                             "p95_us": round(times[int(len(times) * 0.95) - 1 if len(times) > 1 else 0], 1),
+                             "calls": len(times)}
+        connection.close_all()
+    covered = {name.split(",")[0] for name, *_ in all_cases}
+    return results, [name for name in public_functions() if name not in covered]
+
+def main():
+    students = int(sys.argv[1]) if len(sys.argv) > 1 else 150
+    results, missing = run(students)
+    print(f"db/database.py functions, {students} students")
+    for name, r in results.items():
+        print(f"  {name:<36} {r['median_us']:10.1f} us median {r['p95_us']:10.1f} us p95 ({r['calls']} calls)")
+    if missing:
+        print("  no benchmark for: " + ", ".join(missing))
+
+if __name__ == "__main__":
+    main()
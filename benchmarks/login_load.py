@@ -0,0 +1,64 @@
+"""Simulate a burst of concurrent logins and report latency percentiles.
+
+Each simulated session runs auth.auth.authenticate() on its own thread, the
+way Streamlit runs one script thread per session. The burst is run twice:
+with bcrypt called directly on the session threads, and through the bounded
+hashing pool in db/hashing.py.
+
+Usage: python -m benchmarks.login_load [logins] [bcrypt rounds]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.data import PASSWORD, generate, student_username
+from db import connection, hashing
+from auth.auth import authenticate
+
+def seed(path, users, rounds):
+    connection.set_db_path(path)
+    generate(users, 1, 0, 0, submit_rate=0, rounds=rounds)
+
+def burst(users):
+    """Start every login at once and return each one's latency in ms."""
+    latencies = [None] * users
+    start = threading.Barrier(users)
+
+    def session(i):
+        start.wait()
+        t0 = time.perf_counter()
+        assert authenticate(student_username(i), PASSWORD)
+        latencies[i] = (time.perf_counter() - t0) * 1000
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies
+
+def report(name, latencies):
+    q = statistics.quantiles(latencies, n=100, method="inclusive")
+    print(f"  {name:<22} p50 {q[49]:8.1f} ms   p99 {q[98]:8.1f} ms   max {max(latencies):8.1f} ms")
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 150
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    hashing.BCRYPT_ROUNDS = rounds
+    with tempfile.TemporaryDirectory() as tmp:
+        seed(os.path.join(tmp, "bench.db"), users, rounds)
+        print(f"{users} concurrent logins, bcrypt cost {rounds}, {hashing.HASH_WORKERS} hashing workers, {os.cpu_count()} cores")
+        pooled = hashing.verify_password
+        hashing.verify_password = hashing._check
+        try:
+            report("direct on session", burst(users))
+        finally:
+            hashing.verify_password = pooled
+        report("hashing pool", burst(users))
+        connection.close_all()
+
+if __name__ == "__main__":
+    main()
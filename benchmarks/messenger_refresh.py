@@ -0,0 +1,50 @@
+"""Compare a full group chat re-read with the incremental messenger API.
+
+Usage: python -m benchmarks.messenger_refresh [messages]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.data import generate
+from db import connection, database
+
+PAGE_SIZE = 50
+
+def seed(path, messages):
+    connection.set_db_path(path)
+    generate(157, 1, messages, 0, submit_rate=0)
+
+def timed(fn, repeat=20):
+    """Return (ms per call, rows returned by the last call)."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        rows = fn()
+    return (time.perf_counter() - start) / repeat * 1000, len(rows)
+
+def main():
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    with tempfile.TemporaryDirectory() as tmp:
+        seed(os.path.join(tmp, "bench.db"), messages)
+        window = database.get_group_messages_before(None, PAGE_SIZE)
+        last_id = window[-1][0]
+        seq = database.get_message_seq()
+        for msg_id, *_ in window[-5:]:
+            database.edit_group_message(msg_id, "edited")
+        results = [
+            ("full history, get_group_messages()", timed(database.get_group_messages, repeat=5)),
+            (f"first load, newest {PAGE_SIZE}", timed(lambda: database.get_group_messages_before(None, PAGE_SIZE + 1))),
+            ("refresh, no new messages", timed(lambda: database.get_group_messages_since(last_id))),
+            ("refresh, 5 new messages", timed(lambda: database.get_group_messages_since(last_id - 5))),
+            ("change log, nothing changed", timed(lambda: database.get_group_message_changes(seq + 5))),
+            ("change log, 5 edits", timed(lambda: database.get_group_message_changes(seq))),
+            (f"load older page of {PAGE_SIZE}", timed(lambda: database.get_group_messages_before(window[0][0], PAGE_SIZE + 1))),
+        ]
+        connection.close_all()
+    print(f"group chat with {messages} messages")
+    for name, (ms, rows) in results:
+        print(f"  {name:<38} {ms:9.3f} ms  {rows:6d} rows")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Headless end-to-end rerun times of app.py for each page, using Streamlit's AppTest.
+
+Seeds a generated dataset (benchmarks.data), logs in as an admin or a student
+through session state, and reruns each page a few times. Along with the wall
+time per rerun it reports the slowest sections and queries that db.profiling
+traced during those reruns.
+
+Usage: python -m benchmarks.pages [students]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from streamlit.testing.v1 import AppTest
+
+from db import connection, profiling
+from benchmarks.data import generate
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+RERUNS = 5
+
+def page_cases(data):
+    """(label, username, role, page) for every page of the app."""
+    admin, student = data["admins"][0], data["students"][0]
+    return [
+        ("login", None, None, "login"),
+        ("student_dashboard", student, "Student", "student_dashboard"),
+        ("messenger (student)", student, "Student", "messenger"),
+        ("admin_dashboard", admin, "Admin", "admin_dashboard"),
+        ("user_updates", admin, "Admin", "user_updates"),
+        ("messenger (admin)", admin, "Admin", "messenger"),
+    ]
+
+def rerun_page(username, role, page, selected_user, reruns=RERUNS):
+    """Return (wall ms per rerun, the profiling traces of those reruns)."""
+    at = AppTest.from_file(APP, default_timeout=60)
+    if username:
+        at.session_state["logged_in"] = True
+        at.session_state["username"] = username
+        at.session_state["role"] = role
+    at.session_state["page"] = page
+    at.session_state["selected_user"] = selected_user
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"{page} failed: {at.exception[0].value}")
+    seen = len(profiling.recent_traces())
+    times = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        at.run()
+        times.append((time.perf_counter() - start) * 1000)
+    return times, profiling.recent_traces()[seen:]
+
+def slowest_events(traces, kind, limit=3):
+    totals = {}
+    for trace in traces:
+        for event in trace["events"]:
+            if event["kind"] == kind:
+                totals[event["name"]] = totals.get(event["name"], 0) + event["ms"] / len(traces)
+    return [[name, round(ms, 2)] for name, ms in sorted(totals.items(), key=lambda item: item[1], reverse=True)[:limit]]
+
+def run(students=150):
+    """Return {page label: {"median_ms", "max_ms", "sections", "queries"}} for a generated dataset."""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        connection.set_db_path(os.path.join(tmp, "bench.db"))
+        data = generate(students)
+        for label, username, role, page in page_cases(data):
+            times, traces = rerun_page(username, role, page, data["students"][0])
+            results[label] = {"median_ms": round(statistics.median(times), 1), "max_ms": round(max(times), 1),
+                              "sections": slowest_events(traces, "section"), "queries": slowest_events(traces, "query")}
+        connection.close_all()
+    return results
+
+def main():
+    students = int(sys.argv[1]) if len(sys.argv) > 1 else 150
+    print(f"app.py reruns per page, {students} students, median of {RERUNS}")
+    for label, r in run(students).items():
+        sections = ", ".join(f"{name} {ms} ms" for name, ms in r["sections"])
+        print(f"  {label:<22} {r['median_ms']:8.1f} ms (max {r['max_ms']:.1f})   {sections}")
+
+if __name__ == "__main__":
+    main()
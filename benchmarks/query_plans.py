@@ -0,0 +1,115 @@
+"""Check that the lookup queries in db/database.py are served by an index.
+
+Calls each function on a freshly migrated database with a trace callback,
+runs EXPLAIN QUERY PLAN for every statement it issued and exits non-zero if
+any of them falls back to a full table scan.
+
+Usage: python -m benchmarks.query_plans
+"""
+import os
+import re
+import sys
+import tempfile
+
+from db import connection, database
+from db.cache import clear_shared_cache
+
+# (description, call) whose statements are traced, so the check follows the
+# real SQL. Calls that read or empty a whole table on purpose, such as
+# get_all_updates() and clear_all_data(), are not listed. The deletes come
+# last since they remove the seeded rows.
+TRACED = [
+    ("get_user", lambda: database.get_user("AIE23001")),
+    ("get_user_id", lambda: database.get_user_id("AIE23001")),
+    ("update_user", lambda: database.update_user("AIE23001", "AIE23001", None)),
+    ("upsert_update", lambda: database.upsert_update(1, 1, "x")),
+    ("get_user_updates", lambda: database.get_user_updates(1)),
+    ("get_submission_stats", lambda: database.get_submission_stats(10)),
+    ("get_week_submitters", lambda: database.get_week_submitters(1)),
+    ("get_distinct_weeks", database.get_distinct_weeks),
+    ("get_all_usernames", database.get_all_usernames),
+    ("get_admin_usernames", database.get_admin_usernames),
+    ("search_students, short query", lambda: database.search_students("2", 0, database.STUDENT_PAGE_SIZE)),
+    ("search_students, trigram", lambda: database.search_students("230", 0, database.STUDENT_PAGE_SIZE)),
+    ("update_update", lambda: database.update_update(1, 1, "x")),
+    ("create_session", lambda: database.create_session(1, "x", 60)),
+    ("get_session_user", lambda: database.get_session_user("token")),
+    ("delete_session", lambda: database.delete_session("token")),
+    ("get_group_messages_since", lambda: database.get_group_messages_since(0)),
+    ("get_group_messages_before", lambda: database.get_group_messages_before(None, 50)),
+    ("get_group_message_changes", lambda: database.get_group_message_changes(0)),
+    ("edit_group_message", lambda: database.edit_group_message(1, "x")),
+    ("get_private_messages_since", lambda: database.get_private_messages_since("AIE23001", "admin", 0)),
+    ("get_private_messages_before", lambda: database.get_private_messages_before("AIE23001", "admin", None, 50)),
+    ("get_private_message_changes", lambda: database.get_private_message_changes("AIE23001", "admin", 0)),
+    ("edit_private_message", lambda: database.edit_private_message(1, "x")),
+    ("get_inbox", lambda: database.get_inbox("admin")),
+    ("mark_conversation_read", lambda: database.mark_conversation_read("admin", "AIE23001", 1)),
+    ("search", lambda: database.search("x")),
+    ("delete_group_message", lambda: database.delete_group_message(1)),
+    ("delete_private_message", lambda: database.delete_private_message(1)),
+    ("delete_all_private_messages_between", lambda: database.delete_all_private_messages_between("AIE23001", "admin")),
+    ("clear_week_data_for_user", lambda: database.clear_week_data_for_user(1, 1)),
+    ("clear_user_data", lambda: database.clear_user_data(1)),
+    ("clear_week_data_for_all", lambda: database.clear_week_data_for_all(1)),
+    ("delete_user confirmation", lambda: database.clear_data([1], tables=database.CLEAR_TABLES, dry_run=True)),
+    ("delete_user", lambda: database.delete_user("AIE23001")),
+]
+
+def seed(conn):
+    """One student with an update and messages, so every statement of the traced calls runs."""
+    conn.execute("INSERT INTO users (username, password_hash, role) VALUES ('AIE23001', 'x', 'Student'), ('admin', 'x', 'Admin')")
+    conn.execute("INSERT INTO updates (user_id, week, content, timestamp) VALUES (1, 1, 'x', 't')")
+    database.add_group_message("AIE23001", "x")
+    database.add_private_message("AIE23001", "admin", "x")
+
+def traced_statements(conn, call):
+    """Return the statements call() runs, with parameters inlined, leaving out transaction control."""
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        call()
+    finally:
+        conn.set_trace_callback(None)
+    return [sql for sql in statements if sql.lstrip().upper().startswith(("SELECT", "WITH", "INSERT", "UPDATE", "DELETE"))]
+
+# One row per course week (at most 52), so reading them whole is fine.
+PER_WEEK_TABLES = ("weeks", "week_stats")
+
+def full_scans(conn, sql, params):
+    """Return the plan lines that scan a table without using an index.
+
+    A virtual table scan with an M (MATCH) constraint is an FTS index lookup,
+    and scanning a MATERIALIZE or CO-ROUTINE subquery reads rows it already
+    filtered. The per-week tables may be scanned.
+    """
+    plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+    allowed = set(PER_WEEK_TABLES)
+    allowed.update(re.findall(rf"\b(?:{'|'.join(PER_WEEK_TABLES)})\s+(?:AS\s+)?(\w+)", sql))
+    allowed.update(line.split()[1] for line in plan if line.startswith(("MATERIALIZE ", "CO-ROUTINE ")))
+    return [line for line in plan if line.startswith("SCAN") and "USING" not in line and line.split()[1] not in allowed
+            and not re.search(r"VIRTUAL TABLE INDEX \d+:\S*M", line)]
+
+def main():
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        connection.set_db_path(os.path.join(tmp, "plans.db"))
+        database.init_db()
+        with connection.get_connection() as conn:
+            conn.execute("ANALYZE")
+            seed(conn)
+            for name, call in TRACED:
+                # A cached read would run no SQL at all.
+                clear_shared_cache()
+                # Nested get_connection() calls inside call() reuse conn, so all of it is traced.
+                statements = traced_statements(conn, call)
+                scans = [line for sql in statements for line in full_scans(conn, sql, ())]
+                if not statements:
+                    scans = ["no statements traced"]
+                print(f"{'SCAN' if scans else 'ok  '}  {name}" + (f"  ({'; '.join(scans)})" if scans else ""))
+                failures += bool(scans)
+        connection.close_all()
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Compare search() over the FTS5 index with a LIKE scan of updates.content.
+
+Usage: python -m benchmarks.search [rows]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.data import generate
+from db import connection, database
+
+RARE_WORD, RARE_EVERY = "kubernetes", 5000
+# Common words, a word in one row of every RARE_EVERY, and a word in none.
+QUERIES = ("transformer", "gradient batch", "deploy docker latency", RARE_WORD, "xylophone")
+
+def seed(path, rows):
+    connection.set_db_path(path)
+    # Ten weeks per student, each submitted, so there are at least rows updates.
+    generate(-(-rows // 10), 10, 0, 0, submit_rate=1.0)
+    with connection.get_connection() as conn:
+        conn.execute("UPDATE updates SET content = content || ? WHERE update_id % ? = 0", (f" {RARE_WORD}", RARE_EVERY))
+
+def like_search(query, limit=20):
+    """Every word must appear somewhere in the content, as search() requires.
+
+    Unranked, so it can stop at the first `limit` hits; rare words still mean
+    reading the whole table.
+    """
+    words = query.split()
+    where = " AND ".join("content LIKE ?" for _ in words)
+    with connection.get_connection() as conn:
+        return conn.execute(f"SELECT update_id, content FROM updates WHERE {where} LIMIT ?",
+                            (*[f"%{word}%" for word in words], limit)).fetchall()
+
+def timed(fn, *args, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(*args)
+    return (time.perf_counter() - start) / repeat * 1000, len(result)
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        seed(os.path.join(tmp, "bench.db"), rows)
+        print(f"{rows} updates seeded and indexed in {time.perf_counter() - start:.1f} s")
+        print(f"  {'query':<24} {'FTS5 search()':>16} {'LIKE scan':>16}")
+        for query in QUERIES:
+            fts_ms, fts_rows = timed(database.search, query, "updates")
+            like_ms, like_rows = timed(like_search, query)
+            print(f"  {query!r:<24} {fts_ms:9.2f} ms {fts_rows:3d} {like_ms:9.2f} ms {like_rows:3d}")
+        connection.close_all()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Time an admin rerun of the whole app for a small and a large cohort.
+
+Runs app.py with Streamlit's AppTest against a throwaway database and reports
+the median rerun time and how many sidebar buttons were drawn.
+
+Usage: python -m benchmarks.student_list [students ...]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.data import generate
+from db import connection
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+def seed(path, students):
+    connection.set_db_path(path)
+    admin = generate(students, 1, 0, 0, submit_rate=0)["admins"][0]
+    connection.close_all()
+    return admin
+
+def rerun_times(admin, runs=5):
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.session_state["logged_in"] = True
+    at.session_state["username"] = admin
+    at.session_state["role"] = "Admin"
+    at.session_state["page"] = "admin_dashboard"
+    at.run()
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        at.run()
+        times.append((time.perf_counter() - start) * 1000)
+    buttons = sum(1 for button in at.sidebar.button if (button.key or "").startswith("sidebar_AIE"))
+    return statistics.median(times), buttons
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [150, 15_000]
+    with tempfile.TemporaryDirectory() as tmp:
+        for students in sizes:
+            path = os.path.join(tmp, f"students{students}.db")
+            ms, buttons = rerun_times(seed(path, students))
+            print(f"{students:>6} students  {ms:8.1f} ms per admin rerun  {buttons:5d} student buttons")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Cost of the admin dashboard's submissions chart per rerun, and the size of what it sends.
+
+Compares building the figure on every rerun with the cached submissions_figure(),
+then times what st.plotly_chart still does with the cached figure (to_dict and
+JSON serialization) and reports the size of the spec sent to the browser.
+
+Usage: python -m benchmarks.submissions_chart [weeks ...]
+"""
+import statistics
+import sys
+import time
+
+from pages.admin_dashboard import submissions_figure
+
+def median_ms(fn, runs=50):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+def serialize(fig):
+    """What st.plotly_chart does with a figure on every call."""
+    import plotly.io
+    import plotly.tools
+    return plotly.io.to_json(plotly.tools.return_figure_from_figure_or_data(fig, validate_figure=True), validate=False)
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10, 52]
+    for weeks in sizes:
+        labels = tuple(range(1, weeks + 1))
+        counts = tuple(100 + week % 7 for week in labels)
+        build = median_ms(lambda: submissions_figure.__wrapped__(labels, counts))
+        submissions_figure(labels, counts)
+        hit = median_ms(lambda: submissions_figure(labels, counts))
+        fig = submissions_figure(labels, counts)
+        sent = median_ms(lambda: serialize(fig))
+        spec = serialize(fig).encode("utf-8")
+        print(f"{weeks:>3} weeks  build {build:6.2f} ms  cached {hit * 1000:6.1f} us  "
+              f"plotly_chart serialization {sent:5.2f} ms  spec {len(spec) / 1024:5.1f} KB per rerun")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Check the incrementally maintained summary tables against a full recompute.
+
+Applies a random mix of submissions, resubmissions, edits, clears and
+user deletions through db.database, comparing week_stats and student_progress
+with db.summaries.check() as it goes. Exits non-zero on the first mismatch.
+
+Usage: python -m benchmarks.summary_consistency [operations] [seed]
+"""
+import os
+import random
+import sys
+import tempfile
+
+from benchmarks.data import generate
+from db import connection, database, summaries
+
+def apply_random_operation(rng, user_ids):
+    user_id = rng.choice(user_ids)
+    week = rng.randint(1, 10)
+    roll = rng.random()
+    if roll < 0.55:
+        database.upsert_update(user_id, week, "update")
+    elif roll < 0.75:
+        database.update_update(user_id, week, "edited")
+    elif roll < 0.9:
+        database.clear_week_data_for_user(user_id, week)
+    elif roll < 0.96:
+        database.clear_user_data(user_id)
+    elif roll < 0.99:
+        database.clear_week_data_for_all(week)
+    else:
+        database.clear_all_data()
+
+def main():
+    operations = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rng = random.Random(int(sys.argv[2]) if len(sys.argv) > 2 else 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        connection.set_db_path(os.path.join(tmp, "consistency.db"))
+        data = generate(40, 10, 0, 0, submit_rate=0)
+        user_ids = list(data["student_ids"])
+        usernames = dict(zip(data["student_ids"], data["students"]))
+        for step in range(1, operations + 1):
+            apply_random_operation(rng, user_ids)
+            if step % 500 == 0 and len(user_ids) > 20:
+                victim = user_ids.pop(rng.randrange(len(user_ids)))
+                database.delete_user(usernames[victim])
+            if step % 100 == 0 or step == operations:
+                with connection.get_connection() as conn:
+                    mismatches = summaries.check(conn)
+                if mismatches:
+                    print(f"mismatch after {step} operations:")
+                    for table, key, stored, expected in mismatches:
+                        print(f"  {table} {key}: stored {stored}, expected {expected}")
+                    sys.exit(1)
+        with connection.get_connection() as conn:
+            summaries.rebuild(conn)
+            assert not summaries.check(conn)
+        connection.close_all()
+    print(f"summary tables matched a full recompute through {operations} operations")
+
+if __name__ == "__main__":
+    main()
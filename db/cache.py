@@ -0,0 +1,101 @@
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_TTL = 60
+MAX_SHARED_ENTRIES = 2048
+
+# Reads made during one Streamlit script run. None outside request_scope(), in
+# which case nothing is cached.
+_request_cache = contextvars.ContextVar('request_cache', default=None)
+
+@contextmanager
+def request_scope():
+    """Deduplicate identical reads for the duration of the block (one rerun)."""
+    token = _request_cache.set({})
+    try:
+        yield
+    finally:
+        _request_cache.reset(token)
+
+def clear_request_cache():
+    """Forget the reads made so far in the current scope, e.g. after a write."""
+    cache = _request_cache.get()
+    if cache is not None:
+        cache.clear()
+
+def request_cached(fn):
+    """Cache fn's result per argument tuple within the current request scope.
+
+    Callers get the same object back on repeat calls, so they must not mutate it.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args):
+        cache = _request_cache.get()
+        if cache is None:
+            return fn(*args)
+        key = (fn.__name__, args)
+        if key not in cache:
+            cache[key] = fn(*args)
+        return cache[key]
+    return wrapper
+
+# Process-wide cache shared by every Streamlit session. Entries belong to a
+# group; writers call invalidate(group) to bump its generation, which makes all
+# older entries in the group stale at once. The TTL bounds staleness for writes
+# made by other processes.
+_shared_lock = threading.Lock()
+_generations = {}
+_shared_cache = {}
+_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+def invalidate(group):
+    """Mark every cached read in a group as stale."""
+    with _shared_lock:
+        _generations[group] = _generations.get(group, 0) + 1
+        _stats["invalidations"] += 1
+
+def get_generation(group):
+    """Return a group's current generation; it changes on every invalidate(group)."""
+    with _shared_lock:
+        return _generations.get(group, 0)
+
+def get_cache_stats():
+    """Return hit, miss and invalidation counters for the shared cache."""
+    with _shared_lock:
+        return dict(_stats, entries=len(_shared_cache))
+
+def clear_shared_cache():
+    with _shared_lock:
+        _shared_cache.clear()
+
+def shared_cached(group, ttl=DEFAULT_TTL):
+    """Cache fn's result across sessions until ttl expires or the group is invalidated.
+
+    The cached object is shared between sessions, so callers must not mutate it.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args):
+            key = (fn.__name__, args)
+            now = time.monotonic()
+            with _shared_lock:
+                generation = _generations.get(group, 0)
+                entry = _shared_cache.get(key)
+                if entry and entry[0] == generation and entry[1] > now:
+                    _stats["hits"] += 1
+                    return entry[2]
+                _stats["misses"] += 1
+            value = fn(*args)
+            with _shared_lock:
+                # Stored under the generation read before the query, so a write
+                # that lands meanwhile still invalidates this entry.
+                _shared_cache.pop(key, None)
+                _shared_cache[key] = (generation, now + ttl, value)
+                while len(_shared_cache) > MAX_SHARED_ENTRIES:
+                    _shared_cache.pop(next(iter(_shared_cache)))
+            return value
+        return wrapper
+    return decorator
@@ -0,0 +1,81 @@
+import os
+import threading
+from contextlib import contextmanager
+from db.backends import backend_for
+from db.cache import clear_request_cache, clear_shared_cache
+
+DB_PATH = os.environ.get('PROGRESS_PORTAL_DB', 'progress_portal.db')
+# Where the data lives; see db.backends for the supported schemes. Defaults to
+# the SQLite file at DB_PATH.
+DSN = os.environ.get('PROGRESS_PORTAL_DSN') or f'sqlite:///{DB_PATH}'
+POOL_SIZE = int(os.environ.get('PROGRESS_PORTAL_POOL_SIZE', 8))
+
+_backend = None
+_backend_lock = threading.Lock()
+_local = threading.local()
+
+def get_backend():
+    """Return the backend for DSN, creating it (and its pool) on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = backend_for(DSN, POOL_SIZE)
+    return _backend
+
+def dialect():
+    """Return the SQL dialect of the current backend, "sqlite" or "postgresql"."""
+    return get_backend().dialect
+
+@contextmanager
+def get_connection():
+    """Yield a pooled connection and commit (or roll back) when the block exits.
+
+    Nested calls on the same thread share the outer connection and transaction,
+    so helpers such as get_user_id can be called from inside another helper.
+    A block that changed any rows also clears the per-rerun read cache.
+    """
+    if getattr(_local, 'depth', 0):
+        _local.depth += 1
+        try:
+            yield _local.conn
+        finally:
+            _local.depth -= 1
+        return
+
+    backend = get_backend()
+    conn = backend.checkout()
+    _local.conn, _local.depth = conn, 1
+    changes = conn.total_changes
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        if conn.total_changes != changes:
+            clear_request_cache()
+        _local.conn, _local.depth = None, 0
+        backend.checkin(conn)
+
+def set_dsn(dsn):
+    """Point the pool at a different database and drop open connections and cached reads."""
+    global DSN
+    DSN = dsn
+    close_all()
+    clear_shared_cache()
+
+def set_db_path(path):
+    """Point the pool at a different SQLite file."""
+    global DB_PATH
+    DB_PATH = path
+    set_dsn(f'sqlite:///{path}')
+
+def close_all():
+    """Close every idle pooled connection; the next get_connection() opens a fresh pool."""
+    global _backend
+    with _backend_lock:
+        backend, _backend = _backend, None
+    if backend is not None:
+        backend.close()
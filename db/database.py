@@ -1,301 +1,813 @@
-import sqlite3
 from datetime import datetime
-import bcrypt
 import re
+import hashlib
+import secrets
+import threading
+import time
+from datetime import timedelta
+from db import connection, hashing, profiling
+from db.cache import request_cached, shared_cached, invalidate
+from db.connection import get_connection
+from db.notifications import bus
+
+STUDENT_USERNAME_PATTERN = r'^AIE230(0[1-9]|[1-9][0-9]|1[0-5][0-7])$'
+
+_init_lock = threading.Lock()
+_init_timings = {}
 
 def init_db():
-    """Initialize SQLite database with users, updates, and edit permissions tables."""
-    conn = sqlite3.connect('progress_portal.db')
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS users 
-                 (user_id INTEGER PRIMARY KEY AUTOINCREMENT, 
-                  username TEXT UNIQUE, 
-                  password_hash TEXT, 
-                  role TEXT)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS updates 
-                 (update_id INTEGER PRIMARY KEY AUTOINCREMENT, 
-                  user_id INTEGER, 
-                  week INTEGER, 
-                  content TEXT, 
-                  timestamp TEXT,
-                  FOREIGN KEY(user_id) REFERENCES users(user_id))''')
-    c.execute('''CREATE TABLE IF NOT EXISTS edit_permissions 
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT, 
-                  allow_edits INTEGER DEFAULT 0)''')
-    c.execute("INSERT OR IGNORE INTO edit_permissions (allow_edits) VALUES (0)")
-    # Messenger tables
-    c.execute('''CREATE TABLE IF NOT EXISTS group_messages (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        sender TEXT,
-        content TEXT,
-        timestamp TEXT,
-        edited INTEGER DEFAULT 0
-    )''')
-    c.execute('''CREATE TABLE IF NOT EXISTS private_messages (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        sender TEXT,
-        receiver TEXT,
-        content TEXT,
-        timestamp TEXT,
-        edited INTEGER DEFAULT 0
-    )''')
-    conn.commit()
-    conn.close()
+    """Initialize the database by applying any pending schema migrations."""
+    with get_connection() as conn:
+        connection.get_backend().migrate(conn)
+
+def ensure_db():
+    """Run init_db() once per process for the current database.
+
+    Later calls return immediately without touching the database, so a
+    Streamlit rerun does no DDL and takes no write lock.
+    """
+    dsn = connection.DSN
+    if dsn in _init_timings:
+        return
+    with _init_lock:
+        if dsn in _init_timings:
+            return
+        start = time.perf_counter()
+        init_db()
+        _init_timings[dsn] = (time.perf_counter() - start) * 1000
+
+def get_startup_timing():
+    """Return how long schema setup took for each database DSN, in milliseconds."""
+    return dict(_init_timings)
 
 def hash_password(password):
     """Hash a password using bcrypt."""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return hashing.hash_password(password)
 
 def verify_password(password, hashed):
     """Verify a password against its hash."""
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+    return hashing.verify_password(password, hashed)
 
 def add_user(username, password, role):
     """Add a new user to the database with validation."""
-    if role == "Student" and not (re.match(r'^AIE230(0[1-9]|[1-9][0-9]|1[0-5][0-7])$', username) and len(password) >= 8):
+    if role == "Student" and not (re.match(STUDENT_USERNAME_PATTERN, username) and len(password) >= 8):
         return False
-    conn = sqlite3.connect('progress_portal.db')
-    c = conn.cursor()
+    password_hash = hash_password(password)
     try:
-        c.execute("INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)",
-                  (username, hash_password(password), role))
-        conn.commit()
+        with get_connection() as conn:
+            conn.execute("INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)",
+                         (username, password_hash, role))
+        invalidate("users")
         return True
-    except sqlite3.IntegrityError:
+    except connection.get_backend().IntegrityError:
         return False
-    finally:
-        conn.close()
 
+def _stored_hashes(usernames, chunk_size=500):
+    """Return {username: password_hash} for the given usernames that exist."""
+    found = {}
+    with get_connection() as conn:
+        for start in range(0, len(usernames), chunk_size):
+            chunk = usernames[start:start + chunk_size]
+            c = conn.execute(f"SELECT username, password_hash FROM users WHERE username IN ({','.join('?' * len(chunk))})", chunk)
+            found.update(c.fetchall())
+    return found
+
+def bulk_add_users(rows, role="Student", progress=None):
+    """Add many users at once and return a (username, status) pair per input row.
+
+    Passwords are hashed in parallel on the shared hashing pool and all new
+    users are inserted with one executemany in a single transaction.
+    progress, if given, is called as progress(done, total) while hashing.
+    """
+    results = [None] * len(rows)
+    pending = {}
+    for i, (username, password) in enumerate(rows):
+        if role == "Student" and not (re.match(STUDENT_USERNAME_PATTERN, username) and len(password) >= 8):
+            results[i] = (username, "Invalid format or password too short")
+        elif username in pending:
+            results[i] = (username, "Duplicate in file")
+        else:
+            pending[username] = (i, password)
+
+    for username in _stored_hashes(list(pending)):
+        i, _ = pending.pop(username)
+        results[i] = (username, "Already exists or invalid")
+
+    hashes = dict(zip(pending, hashing.hash_passwords([password for _, password in pending.values()], progress)))
+
+    with get_connection() as conn:
+        inserted = conn.executemany("INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?) ON CONFLICT DO NOTHING",
+                                    [(username, hashes[username], role) for username in pending]).rowcount
+        raced = set()
+        if inserted < len(pending):
+            # Someone else added a few of these between the check and the insert.
+            raced = {u for u, h in _stored_hashes(list(pending)).items() if h != hashes[u]}
+    invalidate("users")
+    for username, (i, _) in pending.items():
+        results[i] = (username, "Already exists or invalid" if username in raced else "Success")
+    return results
+
+@request_cached
+@shared_cached("users")
 def get_user(username):
     """Retrieve user details by username."""
-    conn = sqlite3.connect('progress_portal.db')
-    c = conn.cursor()
-    c.execute("SELECT user_id, username, password_hash, role FROM users WHERE username = ?", (username,))
-    user = c.fetchone()
-    conn.close()
-    return user
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT user_id, username, password_hash, role FROM users WHERE username = ?", (username,))
+        return c.fetchone()
 
+@request_cached
+@shared_cached("users")
 def get_all_users():
     """Retrieve all users with their details."""
-    conn = sqlite3.connect('progress_portal.db')
-    c = conn.cursor()
-    c.execute("SELECT user_id, username, role FROM users ORDER BY username")
-    users = c.fetchall()
-    conn.close()
-    return users
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT user_id, username, role FROM users ORDER BY username")
+        return c.fetchall()
 
 def update_user(username, new_username, new_password):
     """Update username and/or password for a user."""
-    conn = sqlite3.connect('progress_portal.db')
-    c = conn.cursor()
-    password_hash = hash_password(new_password) if new_password else get_user(username)[2]
-    c.execute("UPDATE users SET username = ?, password_hash = ? WHERE username = ?",
-              (new_username, password_hash, username))
-    conn.commit()
-    conn.close()
+    password_hash = hash_password(new_password) if new_password else None
+    with get_connection() as conn:
+        if password_hash is None:
+            password_hash = get_user(username)[2]
+        conn.execute("UPDATE users SET username = ?, password_hash = ? WHERE username = ?",
+                     (new_username, password_hash, username))
+    invalidate("users")
 
 def reset_password(username, new_password):
     """Reset a user's password."""
-    conn = sqlite3.connect('progress_portal.db')
-    c = conn.cursor()
-    c.execute("UPDATE users SET password_hash = ? WHERE username = ?", (hash_password(new_password), username))
-    conn.commit()
-    conn.close()
+    password_hash = hash_password(new_password)
+    with get_connection() as conn:
+        conn.execute("UPDATE users SET password_hash = ? WHERE username = ?", (password_hash, username))
+    invalidate("users")
 
 def delete_user(username):
-    """Delete a user and their updates from the database."""
-    conn = sqlite3.connect('progress_portal.db')
-    c = conn.cursor()
+    """Delete a user with their updates, sessions, messages and conversations."""
     user_id = get_user_id(username)
     if user_id:
-        c.execute("DELETE FROM updates WHERE user_id = ?", (user_id,))
-        c.execute("DELETE FROM users WHERE username = ?", (username,))
-        conn.commit()
-    conn.close()
+        clear_data([user_id], tables=CLEAR_TABLES)
+        with get_connection() as conn:
+            conn.execute("DELETE FROM conversations WHERE user_a = ? OR user_b = ?", (username, username))
+            conn.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
+    invalidate("users")
 
+@request_cached
+@shared_cached("users")
 def get_user_id(username):
     """Retrieve user_id by username."""
-    conn = sqlite3.connect('progress_portal.db')
-    c = conn.cursor()
-    c.execute("SELECT user_id FROM users WHERE username = ?", (username,))
-    user_id = c.fetchone()
-    conn.close()
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT user_id FROM users WHERE username = ?", (username,))
+        user_id = c.fetchone()
     return user_id[0] if user_id else None
 
 def add_update(user_id, week, content):
     """Add a new update for a user."""
-    conn = sqlite3.connect('progress_portal.db')
-    c = conn.cursor()
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    c.execute("INSERT INTO updates (user_id, week, content, timestamp) VALUES (?, ?, ?, ?)",
-              (user_id, week, content, timestamp))
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        conn.execute("INSERT INTO updates (user_id, week, content, timestamp) VALUES (?, ?, ?, ?)",
+                     (user_id, week, content, timestamp))
+    bus.publish("updates", f"updates:{user_id}")
+
+def upsert_update(user_id, week, content):
+    """Submit a user's update for a week, replacing any earlier one, in a single statement.
+
+    An update already submitted for a locked week is left alone; returns
+    whether a row was written.
+    """
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with get_connection() as conn:
+        # The lock is checked in the same statement, so a submit racing an
+        # admin's lock cannot overwrite a locked update.
+        written = conn.execute("""
+            INSERT INTO updates (user_id, week, content, timestamp) VALUES (?, ?, ?, ?)
+            ON CONFLICT (user_id, week) DO UPDATE SET content = excluded.content, timestamp = excluded.timestamp
+            WHERE COALESCE((SELECT locked FROM weeks WHERE week = excluded.week), 0) = 0
+        """, (user_id, week, content, timestamp)).rowcount > 0
+    if written:
+        bus.publish("updates", f"updates:{user_id}")
+    return written
 
+@request_cached
 def get_user_updates(user_id):
     """Retrieve all updates for a specific user with week locking."""
-    conn = sqlite3.connect('progress_portal.db')
-    c = conn.cursor()
-    c.execute("SELECT week, content, timestamp FROM updates WHERE user_id = ? ORDER BY week", (user_id,))
-    updates = c.fetchall()
-    conn.close()
-    return updates
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT week, content, timestamp FROM updates WHERE user_id = ? ORDER BY week", (user_id,))
+        return c.fetchall()
 
+@request_cached
 def get_all_updates():
     """Retrieve all updates joined with usernames."""
-    conn = sqlite3.connect('progress_portal.db')
-    c = conn.cursor()
-    c.execute("SELECT u.username, up.week, up.content, up.timestamp FROM updates up JOIN users u ON up.user_id = u.user_id ORDER BY u.username, up.week")
-    updates = c.fetchall()
-    conn.close()
-    return updates
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT u.username, up.week, up.content, up.timestamp FROM updates up JOIN users u ON up.user_id = u.user_id ORDER BY u.username, up.week")
+        return c.fetchall()
+
+@request_cached
+def get_submission_stats(total_weeks):
+    """Read dashboard statistics from the week_stats and student_progress summary tables.
+
+    Returns a dict with user counts by role, the number of distinct users who
+    submitted each week, the number of distinct weeks each student submitted,
+    how many students completed all total_weeks, the average weeks per student
+    and the students with no submissions. Only weeks still in the course
+    count; updates kept for weeks dropped by set_course_length are ignored.
+    """
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT role, COUNT(*) FROM users GROUP BY role")
+        role_counts = dict(c.fetchall())
+        c.execute("SELECT week, submitters FROM week_stats WHERE submitters > 0 AND week IN (SELECT week FROM weeks) ORDER BY week")
+        week_counts = dict(c.fetchall())
+        # student_progress counts every week; subtract the dropped ones, found
+        # through week_stats (CROSS JOIN keeps SQLite from scanning updates
+        # instead) so only their updates are read.
+        c.execute("""
+            SELECT u.username, COALESCE(p.weeks_submitted, 0) - COALESCE(d.dropped, 0)
+            FROM users u LEFT JOIN student_progress p ON p.user_id = u.user_id
+            LEFT JOIN (SELECT up.user_id, COUNT(*) AS dropped FROM week_stats s CROSS JOIN updates up
+                       WHERE up.week = s.week AND s.submitters > 0 AND s.week NOT IN (SELECT week FROM weeks)
+                       GROUP BY up.user_id) d
+                ON d.user_id = u.user_id
+            WHERE u.role = 'Student' ORDER BY u.username
+        """)
+        student_week_counts = dict(c.fetchall())
+    students = len(student_week_counts)
+    return {
+        "total_users": sum(role_counts.values()),
+        "total_students": role_counts.get("Student", 0),
+        "total_admins": role_counts.get("Admin", 0),
+        "week_counts": week_counts,
+        "student_week_counts": student_week_counts,
+        "completed_all": sum(1 for n in student_week_counts.values() if n == total_weeks),
+        "avg_weeks": sum(student_week_counts.values()) / students if students else 0,
+        "no_submissions": [u for u, n in student_week_counts.items() if n == 0],
+    }
 
+@request_cached
+def get_week_submitters(week):
+    """Return the usernames of students who submitted an update for a week."""
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute("""
+            SELECT DISTINCT u.username FROM updates up JOIN users u ON up.user_id = u.user_id
+            WHERE up.week = ? AND u.role = 'Student' ORDER BY u.username
+        """, (week,))
+        return [row[0] for row in c.fetchall()]
+
+@request_cached
+def get_distinct_weeks():
+    """Return the distinct week numbers that have at least one update."""
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT week FROM week_stats WHERE submitters > 0 ORDER BY week")
+        return [row[0] for row in c.fetchall()]
+
+@request_cached
+@shared_cached("users")
 def get_all_usernames():
     """Retrieve all usernames from the users table."""
-    conn = sqlite3.connect('progress_portal.db')
-    c = conn.cursor()
-    c.execute("SELECT username FROM users WHERE role = 'Student' ORDER BY username")
-    usernames = [row[0] for row in c.fetchall()]
-    conn.close()
-    return usernames
-
-def get_edit_permission():
-    """Retrieve the current edit permission status."""
-    conn = sqlite3.connect('progress_portal.db')
-    c = conn.cursor()
-    c.execute("SELECT allow_edits FROM edit_permissions LIMIT 1")
-    allow_edits = c.fetchone()[0]
-    conn.close()
-    return allow_edits
-
-def set_edit_permission(allow_edits):
-    """Set the edit permission status."""
-    conn = sqlite3.connect('progress_portal.db')
-    c = conn.cursor()
-    c.execute("UPDATE edit_permissions SET allow_edits = ?", (allow_edits,))
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT username FROM users WHERE role = 'Student' ORDER BY username")
+        return [row[0] for row in c.fetchall()]
+
+@request_cached
+@shared_cached("users")
+def get_admin_usernames():
+    """Retrieve admin usernames; unlike students there are only a handful."""
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT username FROM users WHERE role = 'Admin' ORDER BY username")
+        return [row[0] for row in c.fetchall()]
+
+STUDENT_PAGE_SIZE = 25
+
+@request_cached
+@shared_cached("users")
+def search_students(query, offset, limit):
+    """Return (usernames, total) for one page of students whose username contains query.
+
+    On SQLite, substrings of three or more characters go through the users_fts
+    trigram index and shorter ones scan the covering (role, username) index.
+    PostgreSQL's pg_trgm index serves the LIKE directly.
+    """
+    query = query.strip()
+    if len(query) >= 3 and connection.dialect() == "sqlite":
+        # A subquery, not a join: joined, SQLite probes the FTS index once per student.
+        source = "users u WHERE u.user_id IN (SELECT rowid FROM users_fts WHERE users_fts MATCH ?) AND u.role = 'Student'"
+        params = ('"' + query.replace('"', '""') + '"',)
+    else:
+        source = "users u WHERE u.role = 'Student' AND u.username LIKE ? ESCAPE '\\'"
+        params = ("%" + re.sub(r"([\\%_])", r"\\\1", query) + "%",)
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute(f"SELECT u.username FROM {source} ORDER BY u.username LIMIT ? OFFSET ?", (*params, limit, offset))
+        usernames = [row[0] for row in c.fetchall()]
+        c.execute(f"SELECT COUNT(*) FROM {source}", params)
+        return usernames, c.fetchone()[0]
+
+# --- Course Weeks ---
+@request_cached
+@shared_cached("weeks")
+def get_weeks():
+    """Return (week, opens_on, closes_on, locked) for every course week, in order."""
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT week, opens_on, closes_on, locked FROM weeks ORDER BY week")
+        return c.fetchall()
+
+def set_course_length(total_weeks):
+    """Add or drop weeks at the end of the course so it runs for total_weeks weeks.
+
+    Updates already submitted for dropped weeks are kept.
+    """
+    with get_connection() as conn:
+        conn.execute("DELETE FROM weeks WHERE week > ?", (total_weeks,))
+        conn.executemany("INSERT INTO weeks (week) VALUES (?) ON CONFLICT DO NOTHING", [(week,) for week in range(1, total_weeks + 1)])
+    invalidate("weeks")
+
+def update_week(week, opens_on, closes_on, locked):
+    """Set a week's submission window (ISO dates or None) and lock flag."""
+    with get_connection() as conn:
+        conn.execute("UPDATE weeks SET opens_on = ?, closes_on = ?, locked = ? WHERE week = ?",
+                     (opens_on, closes_on, int(locked), week))
+    invalidate("weeks")
+
+def set_all_weeks_locked(locked):
+    """Lock or unlock every week at once."""
+    with get_connection() as conn:
+        conn.execute("UPDATE weeks SET locked = ?", (int(locked),))
+    invalidate("weeks")
+
+# --- Bulk Clearing ---
+CLEAR_CHUNK_SIZE = 5000
+# Pause between chunks long enough for writers sleeping in busy_timeout to get the lock.
+CLEAR_CHUNK_PAUSE = 0.03
+CLEAR_TABLES = ("updates", "sessions", "group_messages", "private_messages")
+# Primary key of each clearable table, used to pick a chunk of rows.
+CLEAR_KEYS = {"updates": "update_id", "sessions": "token", "group_messages": "id", "private_messages": "id"}
+# Reclaim disk space once this share of the database file is free pages,
+# releasing this many pages per transaction.
+VACUUM_FREE_RATIO = 0.25
+VACUUM_CHUNK_PAGES = 500
+
+def _clear_filter(table, user_ids, usernames, weeks):
+    """Return the WHERE clause and parameters that select a clear's rows in one table."""
+    clauses, params = [], []
+    if user_ids is not None:
+        if table in ("updates", "sessions"):
+            clauses.append(f"user_id IN ({','.join('?' * len(user_ids))})")
+            params += user_ids
+        elif table == "group_messages":
+            clauses.append(f"sender IN ({','.join('?' * len(usernames))})")
+            params += usernames
+        else:
+            # Through conversations, whose user columns are indexed; private_messages' are not.
+            marks = ",".join("?" * len(usernames))
+            clauses.append(f"conversation_id IN (SELECT conversation_id FROM conversations WHERE user_a IN ({marks}) OR user_b IN ({marks}))")
+            params += usernames * 2
+    if weeks is not None and table == "updates":
+        clauses.append(f"week IN ({','.join('?' * len(weeks))})")
+        params += weeks
+    return " AND ".join(clauses) or "TRUE", params
+
+def clear_data(user_ids=None, weeks=None, tables=("updates",), dry_run=False, chunk_size=CLEAR_CHUNK_SIZE):
+    """Delete the rows of tables that belong to user_ids and, for updates, to weeks.
+
+    None means no filter on that axis. Returns {table: rows}; with dry_run the
+    rows are only counted. Each chunk of chunk_size rows is its own short
+    transaction, so a large clear never holds the write lock for long and can
+    simply be run again if interrupted. Free space is reclaimed afterwards.
+    """
+    unknown = set(tables) - set(CLEAR_TABLES)
+    if unknown:
+        raise ValueError(f"Cannot clear {', '.join(sorted(unknown))}")
+    user_ids = None if user_ids is None else list(user_ids)
+    weeks = None if weeks is None else list(weeks)
+    usernames = None
+    counts, pairs = {}, set()
+    with get_connection() as conn:
+        if user_ids is not None:
+            usernames = [row[0] for row in conn.execute(
+                f"SELECT username FROM users WHERE user_id IN ({','.join('?' * len(user_ids))})", user_ids)]
+        for table in tables:
+            where, params = _clear_filter(table, user_ids, usernames, weeks)
+            counts[table] = conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {where}", params).fetchone()[0]
+            if table == "private_messages" and not dry_run:
+                pairs.update(conn.execute(f"SELECT DISTINCT sender, receiver FROM private_messages WHERE {where}", params))
+    if dry_run:
+        return counts
+    for table in tables:
+        where, params = _clear_filter(table, user_ids, usernames, weeks)
+        key = CLEAR_KEYS[table]
+        deleted = chunk_size
+        while deleted == chunk_size:
+            with get_connection() as conn:
+                deleted = conn.execute(f"DELETE FROM {table} WHERE {key} IN (SELECT {key} FROM {table} WHERE {where} LIMIT ?)",
+                                       (*params, chunk_size)).rowcount
+            if deleted == chunk_size:
+                time.sleep(CLEAR_CHUNK_PAUSE)
+    if pairs:
+        with get_connection() as conn:
+            conn.executemany("""UPDATE conversations SET last_message_id =
+                                    (SELECT MAX(id) FROM private_messages WHERE conversation_id = conversations.conversation_id)
+                                WHERE user_a = ? AND user_b = ?""", {tuple(sorted(pair)) for pair in pairs})
+    topics = []
+    if "updates" in tables:
+        topics += ["updates"] + (["updates:*"] if user_ids is None else [f"updates:{user_id}" for user_id in user_ids])
+    if "group_messages" in tables:
+        topics.append("group")
+    for sender, receiver in pairs:
+        topics += [conversation_key(sender, receiver), f"inbox:{sender}", f"inbox:{receiver}"]
+    bus.publish(*topics)
+    if "sessions" in tables:
+        # The session front cache is keyed on the users generation.
+        invalidate("users")
+    reclaim_space()
+    return counts
+
+def reclaim_space():
+    """Give free pages back to the filesystem once VACUUM_FREE_RATIO of the file is free.
+
+    Databases in incremental auto_vacuum mode (every one created since the
+    pool set that pragma) release VACUUM_CHUNK_PAGES per transaction. An older
+    file gets one full VACUUM, which also converts it to incremental mode.
+    PostgreSQL's autovacuum does this on its own. Returns True if space was
+    reclaimed.
+    """
+    if connection.dialect() != "sqlite":
+        return False
+    with get_connection() as conn:
+        if conn.in_transaction:
+            return False
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        pages = conn.execute("PRAGMA page_count").fetchone()[0]
+        if not pages or free / pages < VACUUM_FREE_RATIO:
+            return False
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            return True
+    # Only the pages free now; writers carrying on meanwhile may free more.
+    for chunk in range(-(-free // VACUUM_CHUNK_PAGES)):
+        if chunk:
+            time.sleep(CLEAR_CHUNK_PAUSE)
+        with get_connection() as conn:
+            # executescript steps the pragma to completion; execute() frees one page.
+            conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_CHUNK_PAGES})")
+    return True
 
 def clear_week_data_for_user(user_id, week):
     """Clear updates for a specific week for a user."""
-    conn = sqlite3.connect('progress_portal.db')
-    c = conn.cursor()
-    c.execute("DELETE FROM updates WHERE user_id = ? AND week = ?", (user_id, week))
-    conn.commit()
-    conn.close()
+    return clear_data([user_id], [week])
 
 def clear_user_data(user_id):
     """Clear all updates for a specific user."""
-    conn = sqlite3.connect('progress_portal.db')
-    c = conn.cursor()
-    c.execute("DELETE FROM updates WHERE user_id = ?", (user_id,))
-    conn.commit()
-    conn.close()
+    return clear_data([user_id])
 
 def clear_all_data():
     """Clear all updates for all users."""
-    conn = sqlite3.connect('progress_portal.db')
-    c = conn.cursor()
-    c.execute("DELETE FROM updates")
-    conn.commit()
-    conn.close()
+    return clear_data()
 
 def clear_week_data_for_all(week):
     """Clear updates for a specific week across all users."""
-    conn = sqlite3.connect('progress_portal.db')
-    c = conn.cursor()
-    c.execute("DELETE FROM updates WHERE week = ?", (week,))
-    conn.commit()
-    conn.close()
+    return clear_data(weeks=[week])
 
 def update_update(user_id, week, new_content):
     """Update an existing update for a user."""
-    conn = sqlite3.connect('progress_portal.db')
-    c = conn.cursor()
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    c.execute("UPDATE updates SET content = ?, timestamp = ? WHERE user_id = ? AND week = ?",
-              (new_content, timestamp, user_id, week))
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        conn.execute("UPDATE updates SET content = ?, timestamp = ? WHERE user_id = ? AND week = ?",
+                     (new_content, timestamp, user_id, week))
+    bus.publish("updates", f"updates:{user_id}")
+
+# --- Session Functions ---
+def password_hash_version(password_hash):
+    """Short fingerprint of a password hash; sessions die when it changes."""
+    return hashlib.sha256(password_hash.encode('utf-8')).hexdigest()[:16]
+
+def create_session(user_id, password_hash, ttl_seconds):
+    """Create a login session for a user and return its token."""
+    token = secrets.token_urlsafe(32)
+    now = datetime.now()
+    with get_connection() as conn:
+        conn.execute("DELETE FROM sessions WHERE expires_at < ?", (now.strftime("%Y-%m-%d %H:%M:%S"),))
+        conn.execute("INSERT INTO sessions (token, user_id, hash_version, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                     (token, user_id, password_hash_version(password_hash), now.strftime("%Y-%m-%d %H:%M:%S"),
+                      (now + timedelta(seconds=ttl_seconds)).strftime("%Y-%m-%d %H:%M:%S")))
+    return token
+
+def get_session_user(token):
+    """Resolve a session token to (user_id, username, role, hash_version, expires_at).
+
+    Returns None if the session is unknown or expired, or if the user's
+    password has changed since the session was created.
+    """
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute("""
+            SELECT u.user_id, u.username, u.role, u.password_hash, s.hash_version, s.expires_at
+            FROM sessions s JOIN users u ON u.user_id = s.user_id
+            WHERE s.token = ? AND s.expires_at > ?
+        """, (token, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        row = c.fetchone()
+    if not row or password_hash_version(row[3]) != row[4]:
+        return None
+    return (row[0], row[1], row[2], row[4], row[5])
+
+def delete_session(token):
+    with get_connection() as conn:
+        conn.execute("DELETE FROM sessions WHERE token = ?", (token,))
 
 # --- Group Chat Functions ---
 def add_group_message(sender, content):
-    conn = sqlite3.connect('progress_portal.db')
-    c = conn.cursor()
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    c.execute("INSERT INTO group_messages (sender, content, timestamp) VALUES (?, ?, ?)", (sender, content, timestamp))
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        conn.execute("INSERT INTO group_messages (sender, content, timestamp) VALUES (?, ?, ?)", (sender, content, timestamp))
+    bus.publish("group")
 
 def get_group_messages():
-    conn = sqlite3.connect('progress_portal.db')
-    c = conn.cursor()
-    c.execute("SELECT id, sender, content, timestamp, edited FROM group_messages ORDER BY id ASC")
-    messages = c.fetchall()
-    conn.close()
-    return messages
+    return get_group_messages_since(0)
+
+def get_group_messages_since(last_id, limit=None):
+    """Return group messages with id greater than last_id, oldest first."""
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT id, sender, content, timestamp, edited FROM group_messages WHERE id > ? ORDER BY id ASC LIMIT ?",
+                  (last_id, 2**63 - 1 if limit is None else limit))
+        return c.fetchall()
+
+def get_group_messages_before(before_id=None, limit=50):
+    """Return the newest `limit` group messages older than before_id (or overall), oldest first."""
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT id, sender, content, timestamp, edited FROM group_messages WHERE id < ? ORDER BY id DESC LIMIT ?",
+                  (before_id if before_id is not None else 2**63 - 1, limit))
+        return c.fetchall()[::-1]
 
 def edit_group_message(msg_id, new_content):
-    conn = sqlite3.connect('progress_portal.db')
-    c = conn.cursor()
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    c.execute("UPDATE group_messages SET content = ?, timestamp = ?, edited = 1 WHERE id = ?", (new_content, timestamp, msg_id))
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        conn.execute("UPDATE group_messages SET content = ?, timestamp = ?, edited = 1 WHERE id = ?", (new_content, timestamp, msg_id))
+    bus.publish("group")
 
 def delete_group_message(msg_id):
-    conn = sqlite3.connect('progress_portal.db')
-    c = conn.cursor()
-    c.execute("DELETE FROM group_messages WHERE id = ?", (msg_id,))
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        conn.execute("DELETE FROM group_messages WHERE id = ?", (msg_id,))
+    bus.publish("group")
 
 def delete_all_group_messages():
-    conn = sqlite3.connect('progress_portal.db')
-    c = conn.cursor()
-    c.execute("DELETE FROM group_messages")
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        conn.execute("DELETE FROM group_messages")
+    bus.publish("group")
+
+# --- Message Change Log ---
+def conversation_key(user1=None, user2=None):
+    """Return the message_events key for the group chat, or for a private chat between two users."""
+    return "group" if user1 is None else "private:" + ":".join(sorted((user1, user2)))
+
+def get_message_seq():
+    """Return the latest message change sequence number."""
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT COALESCE(MAX(seq), 0) FROM message_events")
+        return c.fetchone()[0]
+
+def get_group_message_changes(since_seq):
+    """Return group chat messages inserted, edited or deleted after since_seq.
+
+    Each row is (seq, message_id, id, sender, content, timestamp, edited) with
+    one row per message and seq being its latest change. Deleted messages come
+    back as tombstones whose message columns are all None.
+    """
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute("""
+            SELECT e.seq, e.message_id, m.id, m.sender, m.content, m.timestamp, m.edited
+            FROM (SELECT MAX(seq) AS seq, message_id FROM message_events
+                  WHERE conversation = 'group' AND seq > ? GROUP BY message_id) e
+            LEFT JOIN group_messages m ON m.id = e.message_id
+            ORDER BY 1
+        """, (since_seq,))
+        return c.fetchall()
 
 # --- Private Chat Functions ---
+# Each pair of users shares one conversations row (user_a < user_b), and every
+# private message points at it through conversation_id.
+CONVERSATION_ID = "(SELECT conversation_id FROM conversations WHERE user_a = ? AND user_b = ?)"
+
 def add_private_message(sender, receiver, content):
-    conn = sqlite3.connect('progress_portal.db')
-    c = conn.cursor()
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    c.execute("INSERT INTO private_messages (sender, receiver, content, timestamp) VALUES (?, ?, ?, ?)", (sender, receiver, content, timestamp))
-    conn.commit()
-    conn.close()
+    user_a, user_b = sorted((sender, receiver))
+    # Sending a message also marks everything before it as read for the sender.
+    read_column = "user_a_read_id" if sender == user_a else "user_b_read_id"
+    with get_connection() as conn:
+        conversation_id = conn.execute("""
+            INSERT INTO conversations (user_a, user_b, last_activity) VALUES (?, ?, ?)
+            ON CONFLICT (user_a, user_b) DO UPDATE SET last_activity = excluded.last_activity
+            RETURNING conversation_id
+        """, (user_a, user_b, timestamp)).fetchone()[0]
+        msg_id = conn.execute("INSERT INTO private_messages (sender, receiver, content, timestamp, conversation_id) VALUES (?, ?, ?, ?, ?) RETURNING id",
+                              (sender, receiver, content, timestamp, conversation_id)).fetchone()[0]
+        conn.execute(f"UPDATE conversations SET last_message_id = ?, {read_column} = ? WHERE conversation_id = ?",
+                     (msg_id, msg_id, conversation_id))
+    bus.publish(conversation_key(sender, receiver), f"inbox:{receiver}", f"inbox:{sender}")
 
 def get_private_messages(user1, user2):
-    conn = sqlite3.connect('progress_portal.db')
-    c = conn.cursor()
-    c.execute("""
-        SELECT id, sender, receiver, content, timestamp, edited FROM private_messages
-        WHERE (sender = ? AND receiver = ?) OR (sender = ? AND receiver = ?)
-        ORDER BY id ASC
-    """, (user1, user2, user2, user1))
-    messages = c.fetchall()
-    conn.close()
-    return messages
+    return get_private_messages_since(user1, user2, 0)
+
+def get_private_messages_since(user1, user2, last_id, limit=None):
+    """Return messages between two users with id greater than last_id, oldest first."""
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute(f"""
+            SELECT id, sender, receiver, content, timestamp, edited FROM private_messages
+            WHERE conversation_id = {CONVERSATION_ID} AND id > ?
+            ORDER BY id ASC LIMIT ?
+        """, (*sorted((user1, user2)), last_id, 2**63 - 1 if limit is None else limit))
+        return c.fetchall()
+
+def get_private_messages_before(user1, user2, before_id=None, limit=50):
+    """Return the newest `limit` messages between two users older than before_id, oldest first."""
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute(f"""
+            SELECT id, sender, receiver, content, timestamp, edited FROM private_messages
+            WHERE conversation_id = {CONVERSATION_ID} AND id < ?
+            ORDER BY id DESC LIMIT ?
+        """, (*sorted((user1, user2)), before_id if before_id is not None else 2**63 - 1, limit))
+        return c.fetchall()[::-1]
 
 def edit_private_message(msg_id, new_content):
-    conn = sqlite3.connect('progress_portal.db')
-    c = conn.cursor()
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    c.execute("UPDATE private_messages SET content = ?, timestamp = ?, edited = 1 WHERE id = ?", (new_content, timestamp, msg_id))
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        pair = conn.execute("SELECT sender, receiver FROM private_messages WHERE id = ?", (msg_id,)).fetchone()
+        conn.execute("UPDATE private_messages SET content = ?, timestamp = ?, edited = 1 WHERE id = ?", (new_content, timestamp, msg_id))
+    if pair:
+        bus.publish(conversation_key(*pair))
 
 def delete_private_message(msg_id):
-    conn = sqlite3.connect('progress_portal.db')
-    c = conn.cursor()
-    c.execute("DELETE FROM private_messages WHERE id = ?", (msg_id,))
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        row = conn.execute("SELECT sender, receiver, conversation_id FROM private_messages WHERE id = ?", (msg_id,)).fetchone()
+        conn.execute("DELETE FROM private_messages WHERE id = ?", (msg_id,))
+        if row:
+            conn.execute("""UPDATE conversations SET last_message_id =
+                                (SELECT MAX(id) FROM private_messages WHERE conversation_id = ?)
+                            WHERE conversation_id = ?""", (row[2], row[2]))
+    if row:
+        bus.publish(conversation_key(row[0], row[1]), f"inbox:{row[0]}", f"inbox:{row[1]}")
 
 def delete_all_private_messages_between(user1, user2):
-    conn = sqlite3.connect('progress_portal.db')
-    c = conn.cursor()
-    c.execute("DELETE FROM private_messages WHERE (sender = ? AND receiver = ?) OR (sender = ? AND receiver = ?)", (user1, user2, user2, user1))
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    pair = sorted((user1, user2))
+    with get_connection() as conn:
+        conn.execute(f"DELETE FROM private_messages WHERE conversation_id = {CONVERSATION_ID}", pair)
+        conn.execute("UPDATE conversations SET last_message_id = NULL WHERE user_a = ? AND user_b = ?", pair)
+    bus.publish(conversation_key(user1, user2), f"inbox:{user1}", f"inbox:{user2}")
+
+@request_cached
+def get_inbox(username):
+    """Return (conversation_id, other_user, last_message_id, last_activity, unread) for every private chat of a user.
+
+    Most recently active first. unread counts the messages above the user's
+    read cursor, which only ever holds messages from the other participant.
+    """
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute("""
+            SELECT c.conversation_id, c.other, c.last_message_id, c.last_activity,
+                   CASE WHEN c.last_message_id > c.read_id THEN
+                       (SELECT COUNT(*) FROM private_messages m WHERE m.conversation_id = c.conversation_id AND m.id > c.read_id)
+                   ELSE 0 END
+            FROM (SELECT conversation_id, user_b AS other, last_message_id, last_activity, user_a_read_id AS read_id
+                  FROM conversations WHERE user_a = ?
+                  UNION ALL
+                  SELECT conversation_id, user_a, last_message_id, last_activity, user_b_read_id
+                  FROM conversations WHERE user_b = ?) c
+            ORDER BY c.last_activity DESC
+        """, (username, username))
+        return c.fetchall()
+
+def mark_conversation_read(username, other, up_to_id):
+    """Move a user's read cursor in their chat with other up to message up_to_id.
+
+    up_to_id is the newest message actually shown, so one that arrived while
+    the page rendered stays unread. The cursor never passes the newest message.
+    """
+    user_a, user_b = sorted((username, other))
+    read_column = "user_a_read_id" if username == user_a else "user_b_read_id"
+    with get_connection() as conn:
+        # CASE rather than MIN(), which PostgreSQL spells LEAST().
+        changed = conn.execute(f"""UPDATE conversations
+                                   SET {read_column} = CASE WHEN last_message_id < ? THEN last_message_id ELSE ? END
+                                   WHERE user_a = ? AND user_b = ? AND last_message_id > {read_column} AND ? > {read_column}""",
+                               (up_to_id, up_to_id, user_a, user_b, up_to_id)).rowcount
+    if changed:
+        bus.publish(f"inbox:{username}")
+
+def get_private_message_changes(user1, user2, since_seq):
+    """Return private messages between two users inserted, edited or deleted after since_seq.
+
+    Rows are (seq, message_id, id, sender, receiver, content, timestamp, edited),
+    shaped like get_group_message_changes.
+    """
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute("""
+            SELECT e.seq, e.message_id, m.id, m.sender, m.receiver, m.content, m.timestamp, m.edited
+            FROM (SELECT MAX(seq) AS seq, message_id FROM message_events
+                  WHERE conversation = ? AND seq > ? GROUP BY message_id) e
+            LEFT JOIN private_messages m ON m.id = e.message_id
+            ORDER BY 1
+        """, (conversation_key(user1, user2), since_seq))
+        return c.fetchall()
+
+# --- Search ---
+# Snippet highlight markers. Control characters never appear in typed text, so
+# the UI can escape the snippet and then swap these for real markup.
+SEARCH_MARK = ("\x02", "\x03")
+# bm25 has to score every match before it can sort, which takes about a second
+# for a common word in a million rows. Only the newest SEARCH_CANDIDATES matches
+# of each scope are ranked; FTS5 finds that rowid bound by walking its doclist.
+SEARCH_CANDIDATES = 2000
+SEARCH_SCOPES = {
+    "updates": ("updates_fts", """SELECT 'updates', u.update_id, s.username, 'Week ' || u.week, {snippet}, u.timestamp, bm25(updates_fts)
+                                  FROM updates_fts JOIN updates u ON u.update_id = updates_fts.rowid
+                                  LEFT JOIN users s ON s.user_id = u.user_id"""),
+    "group": ("group_messages_fts", """SELECT 'group', m.id, m.sender, 'Group chat', {snippet}, m.timestamp, bm25(group_messages_fts)
+                                       FROM group_messages_fts JOIN group_messages m ON m.id = group_messages_fts.rowid"""),
+    "private": ("private_messages_fts", """SELECT 'private', m.id, m.sender, 'To ' || m.receiver, {snippet}, m.timestamp, bm25(private_messages_fts)
+                                           FROM private_messages_fts JOIN private_messages m ON m.id = private_messages_fts.rowid"""),
+}
+
+# The same scopes over the generated tsvector columns of the PostgreSQL schema.
+# ts_rank grows with relevance, so it is negated to sort like bm25.
+POSTGRES_SEARCH_SCOPES = {
+    "updates": ("updates", "update_id", """SELECT 'updates', u.update_id, s.username, 'Week ' || u.week, {snippet}, u.timestamp, -ts_rank(u.search, q)
+                                           FROM updates u LEFT JOIN users s ON s.user_id = u.user_id""", "u"),
+    "group": ("group_messages", "id", """SELECT 'group', m.id, m.sender, 'Group chat', {snippet}, m.timestamp, -ts_rank(m.search, q)
+                                         FROM group_messages m""", "m"),
+    "private": ("private_messages", "id", """SELECT 'private', m.id, m.sender, 'To ' || m.receiver, {snippet}, m.timestamp, -ts_rank(m.search, q)
+                                             FROM private_messages m""", "m"),
+}
+
+def _search_sql(scope):
+    if connection.dialect() == "postgresql":
+        table, key, select, alias = POSTGRES_SEARCH_SCOPES[scope]
+        return f"""{select.format(snippet=f"ts_headline('english', {alias}.content, q, ?)")}
+                   CROSS JOIN plainto_tsquery('english', ?) q
+                   CROSS JOIN LATERAL (SELECT COALESCE(
+                       (SELECT {key} FROM {table} WHERE search @@ q ORDER BY {key} DESC LIMIT 1 OFFSET {SEARCH_CANDIDATES - 1}), 0) AS bound) b
+                   WHERE {alias}.search @@ q AND {alias}.{key} >= b.bound
+                   ORDER BY 7 LIMIT ?"""
+    fts, select = SEARCH_SCOPES[scope]
+    return f"""{select.format(snippet=f"snippet({fts}, 0, ?, ?, '…', 12)")}
+               WHERE {fts} MATCH ? AND {fts}.rowid >= COALESCE(
+                   (SELECT rowid FROM {fts} WHERE {fts} MATCH ? ORDER BY rowid DESC LIMIT 1 OFFSET {SEARCH_CANDIDATES - 1}), 0)
+               ORDER BY rank LIMIT ?"""
+
+def _search_params(text, limit):
+    """Parameters for _search_sql(), or None if text has no words to search for."""
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    if connection.dialect() == "postgresql":
+        return (f"StartSel={SEARCH_MARK[0]}, StopSel={SEARCH_MARK[1]}, MaxWords=12, MinWords=6", " ".join(words), limit)
+    match = _match_query(text)
+    return (*SEARCH_MARK, match, match, limit)
+
+def _match_query(text):
+    """Turn free text into an FTS5 query in which every word must match.
+
+    Words are quoted so punctuation can't break the query syntax. The porter
+    tokenizer already matches other forms of a word, so no prefix search is
+    used; a prefix term costs several times more on large tables.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words)
+
+def search(query, scope="all", limit=20):
+    """Full-text search over updates and chat history, best matches first.
+
+    scope is "updates", "group", "private" or "all"; ranking covers the
+    newest SEARCH_CANDIDATES matches per scope. Returns rows of (scope, id,
+    author, context, snippet, timestamp) where the snippet wraps matched
+    terms in SEARCH_MARK.
+    """
+    params = _search_params(query, limit)
+    if params is None:
+        return []
+    scopes = list(SEARCH_SCOPES) if scope == "all" else [scope]
+    rows = []
+    with get_connection() as conn:
+        for name in scopes:
+            rows.extend(conn.execute(_search_sql(name), params).fetchall())
+    rows.sort(key=lambda row: row[-1])
+    return [row[:-1] for row in rows[:limit]]
+
+# Time every public helper above during traced reruns (see db.profiling).
+profiling.instrument(globals(), __name__)
@@ -0,0 +1,71 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+
+# bcrypt cost factor for new hashes. Existing hashes with a different cost are
+# upgraded the next time their owner logs in (see needs_rehash).
+BCRYPT_ROUNDS = int(os.environ.get('PROGRESS_PORTAL_BCRYPT_ROUNDS', 12))
+HASH_WORKERS = int(os.environ.get('PROGRESS_PORTAL_HASH_WORKERS', os.cpu_count() or 1))
+# Requests allowed to wait for a worker before new ones are turned away.
+MAX_PENDING = int(os.environ.get('PROGRESS_PORTAL_HASH_QUEUE', 64))
+QUEUE_TIMEOUT = 10
+
+class HashingBusy(Exception):
+    """Raised when the hashing queue stays full for QUEUE_TIMEOUT seconds."""
+
+# bcrypt releases the GIL, so a thread pool runs hashes truly in parallel while
+# keeping the number of concurrent hashes (and CPU contention) bounded.
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix='bcrypt')
+_slots = threading.BoundedSemaphore(HASH_WORKERS + MAX_PENDING)
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+def _check(password, hashed):
+    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+def submit(fn, *args, timeout=QUEUE_TIMEOUT):
+    """Queue fn on the hashing pool and return its future.
+
+    Waits up to timeout seconds for a free slot (None waits forever) and raises
+    HashingBusy if none frees up.
+    """
+    if not _slots.acquire(timeout=timeout):
+        raise HashingBusy("Too many password checks in progress, please try again.")
+    try:
+        future = _executor.submit(fn, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return future
+
+def hash_password(password, rounds=None):
+    """Hash a password on the hashing pool."""
+    return submit(_hash, password, rounds or BCRYPT_ROUNDS).result()
+
+def verify_password(password, hashed):
+    """Verify a password against its hash on the hashing pool."""
+    return submit(_check, password, hashed).result()
+
+def hash_passwords(passwords, progress=None):
+    """Hash many passwords in parallel and return the hashes in input order.
+
+    Blocks rather than failing when the queue is full, since bulk imports
+    should wait their turn. progress(done, total) is called as hashes finish.
+    """
+    futures = [submit(_hash, password, BCRYPT_ROUNDS, timeout=None) for password in passwords]
+    hashes = []
+    for done, future in enumerate(futures, 1):
+        hashes.append(future.result())
+        if progress:
+            progress(done, len(futures))
+    return hashes
+
+def needs_rehash(hashed):
+    """Return True if a stored hash was made with a different cost factor."""
+    try:
+        return int(hashed.split('$')[2]) != BCRYPT_ROUNDS
+    except (AttributeError, IndexError, ValueError):
+        return False
@@ -0,0 +1,358 @@
+from datetime import datetime
+from db import summaries
+
+def _baseline_schema(c):
+    """Tables created by the original init_db()."""
+    c.execute('''CREATE TABLE IF NOT EXISTS users
+                 (user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  username TEXT UNIQUE,
+                  password_hash TEXT,
+                  role TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS updates
+                 (update_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  user_id INTEGER,
+                  week INTEGER,
+                  content TEXT,
+                  timestamp TEXT,
+                  FOREIGN KEY(user_id) REFERENCES users(user_id))''')
+    c.execute('''CREATE TABLE IF NOT EXISTS edit_permissions
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  allow_edits INTEGER DEFAULT 0)''')
+    c.execute("INSERT OR IGNORE INTO edit_permissions (allow_edits) VALUES (0)")
+    # Messenger tables
+    c.execute('''CREATE TABLE IF NOT EXISTS group_messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sender TEXT,
+        content TEXT,
+        timestamp TEXT,
+        edited INTEGER DEFAULT 0
+    )''')
+    c.execute('''CREATE TABLE IF NOT EXISTS private_messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sender TEXT,
+        receiver TEXT,
+        content TEXT,
+        timestamp TEXT,
+        edited INTEGER DEFAULT 0
+    )''')
+
+def _lookup_indexes(c):
+    """Indexes for the per-user, per-week, student list and private chat lookups."""
+    c.execute("CREATE INDEX IF NOT EXISTS idx_updates_user_week ON updates (user_id, week)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_updates_week ON updates (week)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_users_role_username ON users (role, username)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_private_messages_pair ON private_messages (sender, receiver, id)")
+
+def _message_events(c):
+    """Change log for both message tables, filled by triggers.
+
+    Every insert, edit and delete gets a new seq, so a client can ask for
+    everything that changed in a conversation since the last seq it saw.
+    """
+    c.execute('''CREATE TABLE IF NOT EXISTS message_events (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        conversation TEXT NOT NULL,
+        message_id INTEGER NOT NULL,
+        kind TEXT NOT NULL
+    )''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_message_events_conversation ON message_events (conversation, seq)")
+    private_key = "'private:' || CASE WHEN {0}.sender < {0}.receiver THEN {0}.sender || ':' || {0}.receiver ELSE {0}.receiver || ':' || {0}.sender END"
+    for event, kind, row in (("INSERT", "insert", "NEW"), ("UPDATE", "edit", "NEW"), ("DELETE", "delete", "OLD")):
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS group_messages_{kind}_event AFTER {event} ON group_messages
+                     BEGIN
+                         INSERT INTO message_events (conversation, message_id, kind) VALUES ('group', {row}.id, '{kind}');
+                     END''')
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS private_messages_{kind}_event AFTER {event} ON private_messages
+                     BEGIN
+                         INSERT INTO message_events (conversation, message_id, kind) VALUES ({private_key.format(row)}, {row}.id, '{kind}');
+                     END''')
+
+def _week_user_index(c):
+    """Make the per-week index cover user_id so dashboard counts skip the table."""
+    c.execute("DROP INDEX IF EXISTS idx_updates_week")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_updates_week_user ON updates (week, user_id)")
+
+def _sessions(c):
+    """Server-side login sessions that survive a browser reconnect."""
+    c.execute('''CREATE TABLE IF NOT EXISTS sessions (
+        token TEXT PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        hash_version TEXT NOT NULL,
+        created_at TEXT,
+        expires_at TEXT NOT NULL
+    )''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions (user_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at)")
+
+def _conversations(c):
+    """One row per private chat, with read cursors for unread counts.
+
+    user_a is always the smaller username. A participant's read cursor is the
+    highest message id they have seen, so their unread count is the number of
+    messages in the conversation above it. private_messages.conversation_id
+    turns history reads into a range scan on (conversation_id, id).
+    """
+    c.execute('''CREATE TABLE IF NOT EXISTS conversations (
+        conversation_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_a TEXT NOT NULL,
+        user_b TEXT NOT NULL,
+        last_message_id INTEGER,
+        last_activity TEXT,
+        user_a_read_id INTEGER NOT NULL DEFAULT 0,
+        user_b_read_id INTEGER NOT NULL DEFAULT 0,
+        UNIQUE (user_a, user_b)
+    )''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_conversations_user_b ON conversations (user_b)")
+    c.execute("ALTER TABLE private_messages ADD COLUMN conversation_id INTEGER REFERENCES conversations(conversation_id)")
+    # Existing chats start fully read so nobody is greeted with their whole history as unread.
+    c.execute('''INSERT INTO conversations (user_a, user_b, last_message_id, user_a_read_id, user_b_read_id)
+                 SELECT MIN(sender, receiver), MAX(sender, receiver), MAX(id), MAX(id), MAX(id)
+                 FROM private_messages GROUP BY MIN(sender, receiver), MAX(sender, receiver)''')
+    c.execute('''UPDATE conversations SET last_activity =
+                     (SELECT timestamp FROM private_messages WHERE id = conversations.last_message_id)''')
+    c.execute('''UPDATE private_messages SET conversation_id =
+                     (SELECT conversation_id FROM conversations
+                      WHERE user_a = MIN(private_messages.sender, private_messages.receiver)
+                        AND user_b = MAX(private_messages.sender, private_messages.receiver))''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_private_messages_conversation ON private_messages (conversation_id, id)")
+    c.execute("DROP INDEX IF EXISTS idx_private_messages_pair")
+
+# (FTS table, content table, rowid column) for full-text search.
+FTS_TABLES = (
+    ("updates_fts", "updates", "update_id"),
+    ("group_messages_fts", "group_messages", "id"),
+    ("private_messages_fts", "private_messages", "id"),
+)
+
+def _fts_sync_triggers(c, fts, table, rowid, column="content"):
+    """Create triggers that mirror inserts, edits and deletes of table.column into an external-content FTS table."""
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN
+                     INSERT INTO {fts} (rowid, {column}) VALUES (NEW.{rowid}, NEW.{column});
+                 END''')
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN
+                     INSERT INTO {fts} ({fts}, rowid, {column}) VALUES ('delete', OLD.{rowid}, OLD.{column});
+                 END''')
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {column} ON {table} BEGIN
+                     INSERT INTO {fts} ({fts}, rowid, {column}) VALUES ('delete', OLD.{rowid}, OLD.{column});
+                     INSERT INTO {fts} (rowid, {column}) VALUES (NEW.{rowid}, NEW.{column});
+                 END''')
+    c.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+def _full_text_search(c):
+    """FTS5 indexes over the content of updates and both message tables.
+
+    They are external-content tables, so the text is stored once in the real
+    table; triggers keep the index in step with inserts, edits and deletes.
+    """
+    for fts, table, rowid in FTS_TABLES:
+        c.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(content, content='{table}', content_rowid='{rowid}', tokenize='porter unicode61')")
+        _fts_sync_triggers(c, fts, table, rowid)
+
+def _username_trigrams(c):
+    """Trigram index over usernames for substring search in the admin student list."""
+    c.execute("CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(username, content='users', content_rowid='user_id', tokenize='trigram')")
+    _fts_sync_triggers(c, "users_fts", "users", "user_id", "username")
+
+def _summary_tables(c):
+    """Per-week and per-student submission counts for the admin dashboard."""
+    c.execute('''CREATE TABLE IF NOT EXISTS week_stats (
+        week INTEGER PRIMARY KEY,
+        submitters INTEGER NOT NULL DEFAULT 0
+    )''')
+    c.execute('''CREATE TABLE IF NOT EXISTS student_progress (
+        user_id INTEGER PRIMARY KEY,
+        weeks_submitted INTEGER NOT NULL DEFAULT 0
+    )''')
+    summaries.create_triggers(c)
+    summaries.rebuild(c)
+
+DEFAULT_COURSE_WEEKS = 10
+
+def _course_weeks(c):
+    """One row per course week with optional open/close dates and a lock flag.
+
+    A locked week no longer accepts changes to a submitted update. Weeks start
+    locked exactly when the old global edit permission was off.
+    """
+    c.execute('''CREATE TABLE IF NOT EXISTS weeks (
+        week INTEGER PRIMARY KEY,
+        opens_on TEXT,
+        closes_on TEXT,
+        locked INTEGER NOT NULL DEFAULT 1
+    )''')
+    locked = int(not c.execute("SELECT COALESCE(MAX(allow_edits), 0) FROM edit_permissions").fetchone()[0])
+    last_week = c.execute("SELECT MAX(week) FROM week_stats WHERE submitters > 0").fetchone()[0] or 0
+    c.executemany("INSERT OR IGNORE INTO weeks (week, locked) VALUES (?, ?)",
+                  [(week, locked) for week in range(1, max(DEFAULT_COURSE_WEEKS, last_week) + 1)])
+
+def _unique_user_week(c):
+    """Allow one update per user and week, keeping the newest of any duplicates."""
+    c.execute('''DELETE FROM updates WHERE update_id NOT IN
+                     (SELECT MAX(update_id) FROM updates GROUP BY user_id, week)''')
+    c.execute("DROP INDEX IF EXISTS idx_updates_user_week")
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_updates_user_week ON updates (user_id, week)")
+
+def _sender_index(c):
+    """Index group messages by sender, for clearing a user's messages."""
+    c.execute("CREATE INDEX IF NOT EXISTS idx_group_messages_sender ON group_messages (sender)")
+
+# Ordered list of (version, description, apply). Never edit an entry once it has
+# shipped; append a new one instead.
+MIGRATIONS = [
+    (1, "baseline schema", _baseline_schema),
+    (2, "lookup indexes", _lookup_indexes),
+    (3, "message change log", _message_events),
+    (4, "covering week index", _week_user_index),
+    (5, "login sessions", _sessions),
+    (6, "private conversations", _conversations),
+    (7, "full-text search", _full_text_search),
+    (8, "username trigram index", _username_trigrams),
+    (9, "dashboard summary tables", _summary_tables),
+    (10, "course weeks", _course_weeks),
+    (11, "unique update per user and week", _unique_user_week),
+    (12, "group message sender index", _sender_index),
+]
+
+def _postgres_schema(c):
+    """The schema of SQLite version 11, for a new PostgreSQL database.
+
+    Names, columns and text timestamps match the SQLite tables so db.database
+    runs the same queries on both. Usernames compare byte-wise (COLLATE "C"),
+    like SQLite and Python's sorted(). Full-text search uses generated
+    tsvector columns instead of FTS5 tables, and the username substring
+    search a pg_trgm index where the server has the extension.
+    """
+    username = 'TEXT COLLATE "C"'
+    search = "tsvector GENERATED ALWAYS AS (to_tsvector('english', COALESCE(content, ''))) STORED"
+    c.execute(f"""CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        username {username} UNIQUE,
+        password_hash TEXT,
+        role TEXT)""")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_users_role_username ON users (role, username)")
+    # Without pg_trgm (it ships in contrib) the LIKE scans the (role, username) index.
+    if c.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'").fetchone():
+        c.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_users_username_trgm ON users USING gin (username gin_trgm_ops)")
+    c.execute(f"""CREATE TABLE IF NOT EXISTS updates (
+        update_id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        user_id INTEGER REFERENCES users (user_id),
+        week INTEGER,
+        content TEXT,
+        timestamp TEXT,
+        search {search})""")
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_updates_user_week ON updates (user_id, week)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_updates_week_user ON updates (week, user_id)")
+    c.execute(f"""CREATE TABLE IF NOT EXISTS group_messages (
+        id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        sender {username},
+        content TEXT,
+        timestamp TEXT,
+        edited INTEGER DEFAULT 0,
+        search {search})""")
+    c.execute(f"""CREATE TABLE IF NOT EXISTS conversations (
+        conversation_id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        user_a {username} NOT NULL,
+        user_b {username} NOT NULL,
+        last_message_id INTEGER,
+        last_activity TEXT,
+        user_a_read_id INTEGER NOT NULL DEFAULT 0,
+        user_b_read_id INTEGER NOT NULL DEFAULT 0,
+        UNIQUE (user_a, user_b))""")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_conversations_user_b ON conversations (user_b)")
+    c.execute(f"""CREATE TABLE IF NOT EXISTS private_messages (
+        id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        sender {username},
+        receiver {username},
+        content TEXT,
+        timestamp TEXT,
+        edited INTEGER DEFAULT 0,
+        conversation_id INTEGER REFERENCES conversations (conversation_id),
+        search {search})""")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_private_messages_conversation ON private_messages (conversation_id, id)")
+    for table in ("updates", "group_messages", "private_messages"):
+        c.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_search ON {table} USING gin (search)")
+    c.execute("""CREATE TABLE IF NOT EXISTS message_events (
+        seq BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        conversation TEXT NOT NULL,
+        message_id INTEGER NOT NULL,
+        kind TEXT NOT NULL)""")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_message_events_conversation ON message_events (conversation, seq)")
+    for table, conversation in (("group_messages", "'group'"),
+                                ("private_messages", "'private:' || LEAST(m.sender, m.receiver) || ':' || GREATEST(m.sender, m.receiver)")):
+        c.execute(f"""CREATE OR REPLACE FUNCTION {table}_event() RETURNS trigger AS $$
+                      DECLARE m {table};
+                      BEGIN
+                          IF TG_OP = 'DELETE' THEN m := OLD; ELSE m := NEW; END IF;
+                          INSERT INTO message_events (conversation, message_id, kind)
+                          VALUES ({conversation}, m.id, CASE TG_OP WHEN 'INSERT' THEN 'insert' WHEN 'UPDATE' THEN 'edit' ELSE 'delete' END);
+                          RETURN NULL;
+                      END $$ LANGUAGE plpgsql""")
+        c.execute(f"DROP TRIGGER IF EXISTS {table}_event ON {table}")
+        c.execute(f"""CREATE TRIGGER {table}_event AFTER INSERT OR UPDATE OR DELETE ON {table}
+                      FOR EACH ROW EXECUTE FUNCTION {table}_event()""")
+    c.execute("""CREATE TABLE IF NOT EXISTS sessions (
+        token TEXT PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        hash_version TEXT NOT NULL,
+        created_at TEXT,
+        expires_at TEXT NOT NULL)""")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions (user_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at)")
+    c.execute("CREATE TABLE IF NOT EXISTS week_stats (week INTEGER PRIMARY KEY, submitters INTEGER NOT NULL DEFAULT 0)")
+    c.execute("CREATE TABLE IF NOT EXISTS student_progress (user_id INTEGER PRIMARY KEY, weeks_submitted INTEGER NOT NULL DEFAULT 0)")
+    summaries.create_postgres_triggers(c)
+    c.execute("""CREATE TABLE IF NOT EXISTS weeks (
+        week INTEGER PRIMARY KEY,
+        opens_on TEXT,
+        closes_on TEXT,
+        locked INTEGER NOT NULL DEFAULT 1)""")
+    c.executemany("INSERT INTO weeks (week) VALUES (?) ON CONFLICT DO NOTHING",
+                  [(week,) for week in range(1, DEFAULT_COURSE_WEEKS + 1)])
+
+# PostgreSQL databases start from the current schema, so their history begins
+# at version 11. A migration appended to MIGRATIONS gets the same version here.
+POSTGRES_MIGRATIONS = [
+    (11, "baseline schema", _postgres_schema),
+    (12, "group message sender index", _sender_index),
+]
+
+def get_schema_version(conn):
+    """Return the highest applied migration version, or 0 for a fresh database."""
+    conn.execute('''CREATE TABLE IF NOT EXISTS schema_version
+                    (version INTEGER PRIMARY KEY,
+                     description TEXT,
+                     applied_at TEXT)''')
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+def migrate(conn, migrations=MIGRATIONS, begin="BEGIN IMMEDIATE"):
+    """Apply every pending migration, each in its own transaction.
+
+    begin is the statement that opens a migration's transaction and takes the
+    write lock; None lets the driver open one implicitly. Returns the list of
+    versions that were applied by this call.
+    """
+    if conn.in_transaction:
+        conn.commit()
+    applied = []
+    current = get_schema_version(conn)
+    conn.commit()
+    for version, description, apply in migrations:
+        if version <= current:
+            continue
+        if begin:
+            conn.execute(begin)
+        try:
+            # Another process may have migrated while we waited for the lock.
+            if version <= conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]:
+                conn.commit()
+                continue
+            apply(conn.cursor())
+            conn.execute("INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                         (version, description, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
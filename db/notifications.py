@@ -0,0 +1,32 @@
+import threading
+
+class ChangeBus:
+    """In-process publish/subscribe for "this data changed" notifications.
+
+    Each topic has a version counter. Writers publish the topics they touched;
+    sessions remember the versions they last rendered and compare, which costs
+    a dict lookup instead of a database query.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+
+    def publish(self, *topics):
+        with self._lock:
+            for topic in topics:
+                self._versions[topic] = self._versions.get(topic, 0) + 1
+
+    def versions(self, topics):
+        """Return the current version of each topic, as a tuple in the given order."""
+        with self._lock:
+            return self._current(topics)
+
+    def _current(self, topics):
+        return tuple(self._versions.get(topic, 0) for topic in topics)
+
+# Topics: "group" and conversation_key(a, b) for chats, "inbox:<username>" for a
+# user's unread counts, "updates" for any change to the updates table,
+# "updates:<user_id>" for one student's updates and "updates:*" for changes
+# that touch every student.
+bus = ChangeBus()
@@ -0,0 +1,181 @@
+"""Per-rerun timing of database calls and page sections.
+
+app.main() wraps each Streamlit rerun in trace_rerun(). Inside it, every public
+function of db.database (wrapped by instrument()) records its time and row
+count, and section() records the time of a block of page code. A finished
+trace is kept in a small in-memory ring for the admin perf panel, added to the
+totals served in Prometheus text format, and optionally appended to a JSONL
+file. Outside trace_rerun() the wrappers only cost a context variable lookup.
+
+Optional environment variables:
+- PROGRESS_PORTAL_TRACE_LOG: append one JSON line per rerun to this file.
+- PROGRESS_PORTAL_METRICS_PORT: serve the totals at http://host:port/metrics.
+"""
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TRACE_LOG = os.environ.get('PROGRESS_PORTAL_TRACE_LOG')
+METRICS_PORT = os.environ.get('PROGRESS_PORTAL_METRICS_PORT')
+RECENT_TRACES = 200
+
+# The trace of the rerun running in this context, or None.
+_trace = contextvars.ContextVar('trace', default=None)
+_lock = threading.Lock()
+_recent = deque(maxlen=RECENT_TRACES)
+# (kind, name) -> [calls, seconds, rows]; kind is "query", "section" or "rerun".
+_totals = {}
+_server = None
+
+def _row_count(result):
+    """Rows in a database helper's result: list length, 1 for a single row, else None."""
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple):
+        # search_students returns (page, total).
+        return len(result[0]) if result and isinstance(result[0], list) else 1
+    return 0 if result is None else None
+
+def _record(kind, name, seconds, rows=None):
+    trace = _trace.get()
+    if trace is not None:
+        trace["events"].append({"kind": kind, "name": name, "ms": round(seconds * 1000, 3), "rows": rows,
+                                "depth": trace["depth"]})
+
+def timed(fn):
+    """Record every call of fn made during a traced rerun as a query event."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        trace = _trace.get()
+        if trace is None:
+            return fn(*args, **kwargs)
+        trace["depth"] += 1
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            trace["depth"] -= 1
+            elapsed = time.perf_counter() - start
+        _record("query", fn.__name__, elapsed, _row_count(result))
+        return result
+    return wrapper
+
+def instrument(namespace, module):
+    """Wrap every public function defined in module with timed(), in place."""
+    for name, obj in list(namespace.items()):
+        if callable(obj) and not name.startswith('_') and getattr(obj, '__module__', None) == module:
+            namespace[name] = timed(obj)
+
+@contextmanager
+def section(name):
+    """Time a block of page code; also usable as a decorator."""
+    trace = _trace.get()
+    if trace is None:
+        yield
+        return
+    trace["depth"] += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace["depth"] -= 1
+        _record("section", name, time.perf_counter() - start)
+
+@contextmanager
+def trace_rerun(page):
+    """Collect the query and section events of one rerun and publish them when it ends."""
+    trace = {"time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "page": page, "events": [], "depth": 0}
+    token = _trace.set(trace)
+    start = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        _trace.reset(token)
+        trace["ms"] = round((time.perf_counter() - start) * 1000, 3)
+        del trace["depth"]
+        _publish(trace)
+
+def _publish(trace):
+    with _lock:
+        _recent.append(trace)
+        for event in trace["events"] + [{"kind": "rerun", "name": trace["page"], "ms": trace["ms"], "rows": None}]:
+            totals = _totals.setdefault((event["kind"], event["name"]), [0, 0.0, 0])
+            totals[0] += 1
+            totals[1] += event["ms"] / 1000
+            totals[2] += event["rows"] or 0
+        if TRACE_LOG:
+            with open(TRACE_LOG, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(trace) + "\n")
+
+def recent_traces():
+    """Return the last RECENT_TRACES finished reruns, oldest first."""
+    with _lock:
+        return list(_recent)
+
+def slowest(kind, limit=10):
+    """Return (name, calls, total ms, max ms) for the events of a kind in recent reruns, slowest total first."""
+    stats = {}
+    for trace in recent_traces():
+        for event in trace["events"]:
+            if event["kind"] == kind:
+                entry = stats.setdefault(event["name"], [0, 0.0, 0.0])
+                entry[0] += 1
+                entry[1] += event["ms"]
+                entry[2] = max(entry[2], event["ms"])
+    rows = [(name, calls, total, worst) for name, (calls, total, worst) in stats.items()]
+    return sorted(rows, key=lambda row: row[2], reverse=True)[:limit]
+
+def metrics_text():
+    """Render the running totals in the Prometheus text exposition format."""
+    from db.cache import get_cache_stats
+    lines = []
+    with _lock:
+        totals = sorted(_totals.items())
+    for kind in ("query", "section", "rerun"):
+        metric = f"portal_{kind}_seconds"
+        label = "page" if kind == "rerun" else kind
+        lines += [f"# HELP {metric} Time spent per {kind} in traced reruns.", f"# TYPE {metric} summary"]
+        for (event_kind, name), (calls, seconds, _) in totals:
+            if event_kind == kind:
+                lines.append(f'{metric}_sum{{{label}="{name}"}} {seconds:.6f}')
+                lines.append(f'{metric}_count{{{label}="{name}"}} {calls}')
+    lines += ["# HELP portal_query_rows_total Rows returned per query in traced reruns.", "# TYPE portal_query_rows_total counter"]
+    lines += [f'portal_query_rows_total{{query="{name}"}} {rows}' for (kind, name), (_, _, rows) in totals if kind == "query"]
+    cache = get_cache_stats()
+    lines += ["# HELP portal_shared_cache_events_total Shared read cache lookups and invalidations.",
+              "# TYPE portal_shared_cache_events_total counter"]
+    lines += [f'portal_shared_cache_events_total{{event="{event}"}} {cache[event]}' for event in ("hits", "misses", "invalidations")]
+    return "\n".join(lines) + "\n"
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics_text().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def start_metrics_server(port=METRICS_PORT):
+    """Serve metrics_text() on port in a background thread, once per process; no-op if port is unset."""
+    global _server
+    if not port:
+        return None
+    with _lock:
+        if _server is None:
+            _server = ThreadingHTTPServer(("", int(port)), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+    return _server
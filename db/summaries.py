@@ -0,0 +1,105 @@
+"""Materialized dashboard counts kept in step with the updates table.
+
+week_stats holds the number of users who submitted each week and
+student_progress the number of distinct weeks each user submitted. Triggers
+created by migration 9 (or the PostgreSQL baseline) maintain both; rebuild() recomputes them from scratch
+and check() compares them with a full recompute.
+
+Usage: python -m db.summaries [--rebuild]
+"""
+import sys
+
+# Full recomputes, used by rebuild() and check().
+WEEK_STATS_SQL = "SELECT week, COUNT(DISTINCT user_id) FROM updates GROUP BY week"
+STUDENT_PROGRESS_SQL = "SELECT user_id, COUNT(DISTINCT week) FROM updates GROUP BY user_id"
+
+def create_triggers(c):
+    """Count a (user_id, week) pair when its first update arrives and uncount it when its last one goes."""
+    c.execute('''CREATE TRIGGER IF NOT EXISTS updates_summary_insert AFTER INSERT ON updates
+                 WHEN (SELECT COUNT(*) FROM updates WHERE user_id = NEW.user_id AND week = NEW.week) = 1
+                 BEGIN
+                     INSERT INTO week_stats (week, submitters) VALUES (NEW.week, 1)
+                         ON CONFLICT (week) DO UPDATE SET submitters = submitters + 1;
+                     INSERT INTO student_progress (user_id, weeks_submitted) VALUES (NEW.user_id, 1)
+                         ON CONFLICT (user_id) DO UPDATE SET weeks_submitted = weeks_submitted + 1;
+                 END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS updates_summary_delete AFTER DELETE ON updates
+                 WHEN NOT EXISTS (SELECT 1 FROM updates WHERE user_id = OLD.user_id AND week = OLD.week)
+                 BEGIN
+                     UPDATE week_stats SET submitters = submitters - 1 WHERE week = OLD.week;
+                     UPDATE student_progress SET weeks_submitted = weeks_submitted - 1 WHERE user_id = OLD.user_id;
+                 END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS users_summary_delete AFTER DELETE ON users
+                 BEGIN
+                     DELETE FROM student_progress WHERE user_id = OLD.user_id;
+                 END''')
+
+def create_postgres_triggers(c):
+    """The same triggers as create_triggers(), as PL/pgSQL functions."""
+    c.execute("""CREATE OR REPLACE FUNCTION updates_summary_insert() RETURNS trigger AS $$
+                 BEGIN
+                     IF (SELECT COUNT(*) FROM updates WHERE user_id = NEW.user_id AND week = NEW.week) = 1 THEN
+                         INSERT INTO week_stats (week, submitters) VALUES (NEW.week, 1)
+                             ON CONFLICT (week) DO UPDATE SET submitters = week_stats.submitters + 1;
+                         INSERT INTO student_progress (user_id, weeks_submitted) VALUES (NEW.user_id, 1)
+                             ON CONFLICT (user_id) DO UPDATE SET weeks_submitted = student_progress.weeks_submitted + 1;
+                     END IF;
+                     RETURN NULL;
+                 END $$ LANGUAGE plpgsql""")
+    c.execute("""CREATE OR REPLACE FUNCTION updates_summary_delete() RETURNS trigger AS $$
+                 BEGIN
+                     IF NOT EXISTS (SELECT 1 FROM updates WHERE user_id = OLD.user_id AND week = OLD.week) THEN
+                         UPDATE week_stats SET submitters = submitters - 1 WHERE week = OLD.week;
+                         UPDATE student_progress SET weeks_submitted = weeks_submitted - 1 WHERE user_id = OLD.user_id;
+                     END IF;
+                     RETURN NULL;
+                 END $$ LANGUAGE plpgsql""")
+    c.execute("""CREATE OR REPLACE FUNCTION users_summary_delete() RETURNS trigger AS $$
+                 BEGIN
+                     DELETE FROM student_progress WHERE user_id = OLD.user_id;
+                     RETURN NULL;
+                 END $$ LANGUAGE plpgsql""")
+    for name, event, table in (("updates_summary_insert", "INSERT", "updates"),
+                               ("updates_summary_delete", "DELETE", "updates"),
+                               ("users_summary_delete", "DELETE", "users")):
+        c.execute(f"DROP TRIGGER IF EXISTS {name} ON {table}")
+        c.execute(f"CREATE TRIGGER {name} AFTER {event} ON {table} FOR EACH ROW EXECUTE FUNCTION {name}()")
+
+def rebuild(conn):
+    """Recompute both summary tables from the updates table."""
+    conn.execute("DELETE FROM week_stats")
+    conn.execute("DELETE FROM student_progress")
+    conn.execute(f"INSERT INTO week_stats (week, submitters) {WEEK_STATS_SQL}")
+    conn.execute(f"INSERT INTO student_progress (user_id, weeks_submitted) {STUDENT_PROGRESS_SQL}")
+
+def check(conn):
+    """Return a list of (table, key, stored, expected) rows where the summaries disagree with a full recompute."""
+    mismatches = []
+    for table, stored_sql, expected_sql in (
+        ("week_stats", "SELECT week, submitters FROM week_stats", WEEK_STATS_SQL),
+        ("student_progress", "SELECT user_id, weeks_submitted FROM student_progress", STUDENT_PROGRESS_SQL),
+    ):
+        # Rows counted down to zero are equivalent to missing rows.
+        stored = {key: count for key, count in conn.execute(stored_sql) if count}
+        expected = dict(conn.execute(expected_sql).fetchall())
+        for key in sorted(stored.keys() | expected.keys()):
+            if stored.get(key, 0) != expected.get(key, 0):
+                mismatches.append((table, key, stored.get(key, 0), expected.get(key, 0)))
+    return mismatches
+
+def main():
+    from db.connection import get_connection
+    from db.database import ensure_db
+    ensure_db()
+    with get_connection() as conn:
+        if "--rebuild" in sys.argv[1:]:
+            rebuild(conn)
+            print("summary tables rebuilt")
+        mismatches = check(conn)
+    for table, key, stored, expected in mismatches:
+        print(f"{table} {key}: stored {stored}, expected {expected}")
+    print("summary tables consistent" if not mismatches else f"{len(mismatches)} mismatches")
+    sys.exit(1 if mismatches else 0)
+
+if __name__ == "__main__":
+    main()
@@ -67,7 +67,8 @@ def add_sample_update(user_id, week, content):
     conn = connect_db()
     c = conn.cursor()
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    c.execute("INSERT INTO updates (user_id, week, content, timestamp) VALUES (?, ?, ?, ?)",
+    c.execute("""INSERT INTO updates (user_id, week, content, timestamp) VALUES (?, ?, ?, ?)
+                 ON CONFLICT (user_id, week) DO UPDATE SET content = excluded.content, timestamp = excluded.timestamp""",
               (user_id, week, content, timestamp))
     conn.commit()
     print(f"Sample update added for user_id {user_id}.")
@@ -1,73 +1,98 @@
+import functools
+import html
 import streamlit as st
-import pandas as pd
-from db.database import add_user
+from db.database import add_user, get_submission_stats, get_week_submitters, get_weeks, search, SEARCH_MARK
+from db.profiling import section
+from ui.live import rerun_on_change
+
+SEARCH_SCOPE_LABELS = {"all": "Everything", "updates": "Weekly updates", "group": "Group chat", "private": "Private chats"}
+
+@functools.lru_cache(maxsize=32)
+def submissions_figure(weeks, counts):
+    """Bar chart of submissions per week, built once per distinct set of counts.
+
+    The dashboard reruns whenever the "updates" topic changes (see
+    ui.live.rerun_on_change), usually with the same counts, and building the
+    figure costs far more than Streamlit serializing it. The figure is shared
+    between sessions, so callers must not modify it.
+    """
+    import plotly.colors
+    import plotly.graph_objects as go
+    color_sequence = plotly.colors.qualitative.Plotly
+    bar_colors = [color_sequence[i % len(color_sequence)] for i in range(len(weeks))]
+    fig = go.Figure(
+        data=[go.Bar(x=weeks, y=counts, marker_color=bar_colors)],
+    )
+    fig.update_layout(
+        title='Student Submissions per Week',
+        xaxis_title='Week',
+        yaxis_title='Number of Students',
+        xaxis=dict(tickmode='linear', dtick=1, type='category'),
+        yaxis=dict(tickmode='linear', dtick=1),
+        plot_bgcolor='#1a202c',
+        paper_bgcolor='#1a202c',
+        font_color='#f7fafc'
+    )
+    return fig
+
+def show_search():
+    """Full-text search box over updates and chat history."""
+    st.subheader("Search 🔎")
+    col_query, col_scope = st.columns([3, 1])
+    query = col_query.text_input("Search updates and messages", key="admin_search_query")
+    scope = col_scope.selectbox("In", list(SEARCH_SCOPE_LABELS), format_func=SEARCH_SCOPE_LABELS.get, key="admin_search_scope")
+    if not query.strip():
+        return
+    results = search(query, scope, limit=25)
+    if not results:
+        st.info("No matches.")
+        return
+    lines = []
+    for _, _, author, context, snippet, timestamp in results:
+        snippet = html.escape(snippet).replace(SEARCH_MARK[0], "<mark>").replace(SEARCH_MARK[1], "</mark>")
+        lines.append(f"<p><b>{html.escape(author or '?')}</b> · {html.escape(context)} · "
+                     f"<span style='color:#a0aec0;'>{html.escape(timestamp or '')}</span><br>{snippet}</p>")
+    st.markdown("".join(lines), unsafe_allow_html=True)
 
 def show_admin_dashboard():
     """Display admin dashboard with enhanced UI."""
     with st.container():
         st.subheader("Admin Statistics 📊")
-        from db.database import get_all_users
-        users = get_all_users()
-        total_users = len(users)
-        total_students = sum(1 for u in users if u[2] == "Student")
-        total_admins = sum(1 for u in users if u[2] == "Admin")
+        rerun_on_change(["updates"], "live_admin_dashboard")
+        week_numbers = [week[0] for week in get_weeks()]
+        total_weeks = len(week_numbers)
+        stats = get_submission_stats(total_weeks)
         col1, col2, col3 = st.columns(3)
-        col1.metric("Total Users", total_users)
-        col2.metric("Total Students", total_students)
-        col3.metric("Total Admins", total_admins)
+        col1.metric("Total Users", stats["total_users"])
+        col2.metric("Total Students", stats["total_students"])
+        col3.metric("Total Admins", stats["total_admins"])
 
         # Bar graph: Number of students who submitted for each week
-        from db.database import get_all_updates
-        updates = get_all_updates()
-        # Count unique students per week
-        week_student = {}
-        for username, week, content, timestamp in updates:
-            week_student.setdefault(int(week), set()).add(username)
-        weeks = sorted(week_student.keys())
-        counts = [len(week_student[w]) for w in weeks]
-        import plotly.graph_objects as go
-        import plotly.colors
-        color_sequence = plotly.colors.qualitative.Plotly
-        bar_colors = [color_sequence[i % len(color_sequence)] for i in range(len(weeks))]
-        if weeks:
-            fig = go.Figure(
-                data=[go.Bar(x=weeks, y=counts, marker_color=bar_colors)],
-            )
-            fig.update_layout(
-                title='Student Submissions per Week',
-                xaxis_title='Week',
-                yaxis_title='Number of Students',
-                xaxis=dict(tickmode='linear', dtick=1, type='category'),
-                yaxis=dict(tickmode='linear', dtick=1),
-                plot_bgcolor='#1a202c',
-                paper_bgcolor='#1a202c',
-                font_color='#f7fafc'
-            )
-            st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.info('No student submissions yet to display.')
+        weeks = list(stats["week_counts"])
+        counts = list(stats["week_counts"].values())
+        with section("submissions_chart"):
+            if weeks:
+                st.plotly_chart(submissions_figure(tuple(weeks), tuple(counts)), use_container_width=True)
+            else:
+                st.info('No student submissions yet to display.')
+
+        # --- Search ---
+        st.markdown('---')
+        show_search()
 
         # --- Submission Completion Rate ---
         st.markdown('---')
         st.subheader('Submission Completion Rate')
-        all_students = [u[1] for u in users if u[2] == "Student"]
-        student_weeks = {u: set() for u in all_students}
-        for username, week, content, timestamp in updates:
-            if username in student_weeks:
-                student_weeks[username].add(int(week))
-        total_weeks = 10
-        completed_all = sum(1 for weeks in student_weeks.values() if len(weeks) == total_weeks)
-        avg_weeks = sum(len(weeks) for weeks in student_weeks.values()) / len(student_weeks) if student_weeks else 0
-        st.metric("% Students Completed All Weeks", f"{(completed_all/len(student_weeks)*100 if student_weeks else 0):.1f}%")
-        st.metric("Average Weeks Submitted per Student", f"{avg_weeks:.2f}")
+        total_students = stats["total_students"]
+        st.metric("% Students Completed All Weeks", f"{(stats['completed_all']/total_students*100 if total_students else 0):.1f}%")
+        st.metric("Average Weeks Submitted per Student", f"{stats['avg_weeks']:.2f}")
 
         # --- Week-wise Submission Completion ---
         st.markdown('---')
         st.subheader('Week-wise Submission Completion')
-        week_options = list(range(1, total_weeks+1))
-        selected_week = st.selectbox("Select Week", week_options, key="weekwise_completion")
-        students_this_week = [u for u, weeks in student_weeks.items() if selected_week in weeks]
-        percent_this_week = (len(students_this_week) / len(all_students) * 100) if all_students else 0
+        selected_week = st.selectbox("Select Week", week_numbers, key="weekwise_completion")
+        students_this_week = get_week_submitters(selected_week)
+        percent_this_week = (len(students_this_week) / total_students * 100) if total_students else 0
         st.metric(f"% Students Submitted for Week {selected_week}", f"{percent_this_week:.1f}%")
         st.metric(f"Number of Students Submitted for Week {selected_week}", f"{len(students_this_week)}")
         with st.expander(f"Show Students for Week {selected_week}"):
@@ -79,7 +104,7 @@ def show_admin_dashboard():
         # --- Students with No Submissions ---
         st.markdown('---')
         st.subheader('Students with No Submissions')
-        no_subs = [u for u, weeks in student_weeks.items() if not weeks]
+        no_subs = stats["no_submissions"]
         if no_subs:
             st.write(", ".join(no_subs))
         else:
@@ -1,10 +1,71 @@
 import streamlit as st
 from db.database import (
-    get_group_messages, add_group_message, edit_group_message, delete_group_message,
-    get_private_messages, add_private_message, edit_private_message, delete_private_message,
-    get_all_usernames, get_all_users
+    get_group_messages_before, get_group_message_changes, add_group_message, edit_group_message, delete_group_message,
+    get_private_messages_before, get_private_message_changes, add_private_message, edit_private_message, delete_private_message,
+    get_all_usernames, get_all_users, conversation_key, get_message_seq, get_inbox, mark_conversation_read
 )
 from datetime import datetime
+from ui.chat import render_conversation, show_message_actions
+from ui.live import rerun_on_change
+
+MESSAGE_PAGE_SIZE = 50
+
+# --- Message cache ---
+# Each conversation keeps the rows it has already loaded in session_state, keyed
+# by message id, plus the last change seq it has seen. A rerun only asks the
+# message_events log for what changed since then, which covers new messages as
+# well as edits and deletes from other sessions. "Load older" widens the window
+# one page at a time.
+def get_cached_messages(key, fetch_changes, fetch_before):
+    """Return the cached window for a conversation, applying only new changes."""
+    cache = st.session_state.setdefault("messenger_cache", {})
+    window = st.session_state.setdefault("messenger_window", {}).get(key, MESSAGE_PAGE_SIZE)
+    entry = cache.get(key)
+    if entry is None:
+        # Read the seq first so nothing that lands during the window read is missed.
+        seq = get_message_seq()
+        rows = fetch_before(None, window + 1)
+        entry = cache[key] = {"rows": {row[0]: row for row in rows[-window:]}, "seq": seq, "has_older": len(rows) > window}
+    else:
+        apply_message_changes(entry, fetch_changes(entry["seq"]))
+    return entry
+
+def apply_message_changes(entry, changes):
+    """Merge change-log rows (seq, message_id, *row) into a cached window."""
+    rows = entry["rows"]
+    oldest_id = next(iter(rows)) if rows and entry["has_older"] else 0
+    appended = False
+    for seq, message_id, *row in changes:
+        entry["seq"] = max(entry["seq"], seq)
+        if row[0] is None:
+            rows.pop(message_id, None)
+        elif message_id in rows:
+            rows[message_id] = tuple(row)
+        elif message_id > oldest_id:
+            rows[message_id] = tuple(row)
+            appended = True
+    if appended:
+        entry["rows"] = dict(sorted(rows.items()))
+
+def load_older_messages(key, fetch_before):
+    """Prepend the previous page of messages to a cached conversation."""
+    entry = st.session_state["messenger_cache"][key]
+    oldest_id = next(iter(entry["rows"]), None)
+    older = fetch_before(oldest_id, MESSAGE_PAGE_SIZE + 1)
+    entry["rows"] = {**{row[0]: row for row in older[-MESSAGE_PAGE_SIZE:]}, **entry["rows"]}
+    entry["has_older"] = len(older) > MESSAGE_PAGE_SIZE
+    windows = st.session_state["messenger_window"]
+    windows[key] = windows.get(key, MESSAGE_PAGE_SIZE) + MESSAGE_PAGE_SIZE
+
+def show_load_older(key, entry, fetch_before):
+    if entry["has_older"] and st.button("Load older ⬆️", key=f"load_older_{key}"):
+        load_older_messages(key, fetch_before)
+        st.rerun()
+
+def selected_option(key, options):
+    """The option a selectbox with this key returns on this run, before it is drawn."""
+    value = st.session_state.get(key)
+    return value if value in options else (options[0] if options else None)
 
 # --- Messenger UI ---
 def show_messenger():
@@ -32,15 +93,37 @@ def show_messenger():
     def set_tab(idx):
         st.session_state["messenger_tab"] = idx
     tabs = st.tabs(tab_labels)
+    current_user = st.session_state.get("username")
+    all_users = get_all_users()
+    other_students = [u[1] for u in all_users if u[2] == "Student" and u[1] != current_user]
+    all_students = [u[1] for u in all_users if u[2] == "Student"]
+    admin_usernames = [u[1] for u in all_users if u[2] == "Admin"]
+    if current_role == "Admin":
+        chat_partners = [selected_option("admin_to_student_select", all_students)]
+    elif current_role == "Student":
+        chat_partners = [selected_option("student_to_student_select", other_students),
+                         selected_option("student_to_admin_select", admin_usernames)]
+    else:
+        chat_partners = []
+    # Rerun when a conversation on screen changes instead of waiting for Refresh.
+    # The versions are taken before any message is read, so a change that lands
+    # while this run reads still triggers the next one.
+    rerun_on_change(["group", f"inbox:{current_user}"] + [conversation_key(current_user, other) for other in chat_partners if other],
+                    "live_messenger")
+    # Unread counts for every private chat of this user, from one query.
+    unread = {other: count for _, other, _, _, count in get_inbox(current_user) if count}
+    with_unread = lambda name: f"{name} ({unread[name]} new)" if name in unread else name
 
     # --- Group Chat Tab ---
     with tabs[0]:
+        group_key = conversation_key()
         if st.button("Refresh 🔄", key="group_refresh_btn"):
             set_tab(0)
             st.rerun()
         st.subheader("Group Chat")
         st.caption("All users can chat here. Admin can edit any message. Students can edit/delete their own.")
-        messages = get_group_messages()
+        group_cache = get_cached_messages(group_key, get_group_message_changes, get_group_messages_before)
+        messages = group_cache["rows"].values()
         current_user = st.session_state.get("username")
         current_role = st.session_state.get("role")
         # --- Delete All Buttons for Admin ---
@@ -55,39 +138,15 @@ def show_messenger():
                 st.rerun()
         # --- Hide messages for 'Delete All (for me)' ---
         hide_for_me = st.session_state.get("hide_group_messages_for_me", False)
-        st.markdown('<div style="border:2px solid #4a5568; border-radius:10px; padding:16px; background:#23272e; max-height:400px; overflow-y:auto;">', unsafe_allow_html=True)
         if not hide_for_me:
-            for msg_id, sender, content, timestamp, edited in messages:
-                is_admin = current_role == "Admin"
-                is_self = sender == current_user
-                bubble_color = "#2563eb" if is_self else ("#f59e42" if sender.lower() == "admin" else "#374151")
-                text_color = "#fff" if is_self or sender.lower() == "admin" else "#f7fafc"
-                align = "right" if is_self else "left"
-                st.markdown(f"""
-                <div style='display:flex; flex-direction:column; align-items:{'flex-end' if is_self else 'flex-start'}; margin-bottom:8px;'>
-                    <div style='background:{bubble_color}; color:{text_color}; padding:10px 16px; border-radius:12px; max-width:70%; box-shadow:0 2px 8px #0002;'>
-                        <b>{sender}</b><br>{content}
-                        <div style='font-size:0.8em; color:#d1d5db; text-align:{align};'>{timestamp}{' (edited)' if edited else ''}</div>
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
-                cols = st.columns([1,1,6])
-                if (is_admin or is_self):
-                    if cols[0].button("Edit", key=f"edit_group_{msg_id}"):
-                        st.session_state[f"edit_group_{msg_id}"] = True
-                if is_self:
-                    if cols[1].button("Delete", key=f"delete_group_{msg_id}"):
-                        delete_group_message(msg_id)
-                if st.session_state.get(f"edit_group_{msg_id}", False):
-                    new_content = st.text_area("Edit Message", value=content, key=f"edit_group_content_{msg_id}")
-                    if st.button("Save", key=f"save_group_{msg_id}"):
-                        edit_group_message(msg_id, new_content)
-                        st.session_state[f"edit_group_{msg_id}"] = False
-                    if st.button("Cancel", key=f"cancel_group_{msg_id}"):
-                        st.session_state[f"edit_group_{msg_id}"] = False
+            show_load_older(group_key, group_cache, get_group_messages_before)
+            render_conversation(group_cache, current_user, highlight="admin")
+            show_message_actions("group", messages,
+                                 can_edit=lambda row: current_role == "Admin" or row[1] == current_user,
+                                 can_delete=lambda row: row[1] == current_user,
+                                 on_edit=edit_group_message, on_delete=delete_group_message)
         else:
             st.info("All group messages are hidden for you. Click 'Refresh' to show again.")
-        st.markdown('</div>', unsafe_allow_html=True)
         st.markdown("---")
         # Clear input before widget if just sent
         if st.session_state.get("clear_group_new_msg", False):
@@ -107,14 +166,10 @@ def show_messenger():
             st.rerun()
         st.subheader("Personal Chat (Student-to-Student)")
         st.caption("Students can chat privately with other students.")
-        current_user = st.session_state.get("username")
-        current_role = st.session_state.get("role")
-        all_users = get_all_users() if 'get_all_users' in globals() or 'get_all_users' in locals() else []
         if current_role == "Student":
-            other_students = [u[1] for u in all_users if u[2] == "Student" and u[1] != current_user]
             chat_with = None
             if other_students:
-                selected_student = st.selectbox("Select Student to Chat With", other_students, key="student_to_student_select")
+                selected_student = st.selectbox("Select Student to Chat With", other_students, key="student_to_student_select", format_func=with_unread)
                 chat_with = selected_student
             if chat_with:
                 # --- Delete All (for me) ---
@@ -122,38 +177,21 @@ def show_messenger():
                     st.session_state[f"hide_student_private_{chat_with}"] = True
                 hide_for_me = st.session_state.get(f"hide_student_private_{chat_with}", False)
                 st.info(f"You are chatting with: {chat_with}")
-                messages = get_private_messages(current_user, chat_with)
-                st.markdown('<div style="border:2px solid #4a5568; border-radius:10px; padding:16px; background:#23272e; max-height:400px; overflow-y:auto;">', unsafe_allow_html=True)
+                private_key = conversation_key(current_user, chat_with)
+                fetch_changes = lambda since_seq: get_private_message_changes(current_user, chat_with, since_seq)
+                fetch_before = lambda before_id, limit: get_private_messages_before(current_user, chat_with, before_id, limit)
+                private_cache = get_cached_messages(private_key, fetch_changes, fetch_before)
+                messages = private_cache["rows"].values()
                 if not hide_for_me:
-                    for msg_id, sender, receiver, content, timestamp, edited in messages:
-                        is_self = sender == current_user
-                        bubble_color = "#2563eb" if is_self else "#374151"
-                        text_color = "#fff" if is_self else "#f7fafc"
-                        align = "right" if is_self else "left"
-                        st.markdown(f"""
-                        <div style='display:flex; flex-direction:column; align-items:{'flex-end' if is_self else 'flex-start'}; margin-bottom:8px;'>
-                            <div style='background:{bubble_color}; color:{text_color}; padding:10px 16px; border-radius:12px; max-width:70%; box-shadow:0 2px 8px #0002;'>
-                                <b>{sender}</b><br>{content}
-                                <div style='font-size:0.8em; color:#d1d5db; text-align:{align};'>{timestamp}{' (edited)' if edited else ''}</div>
-                            </div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                        cols = st.columns([1,1,6])
-                        if is_self:
-                            if cols[0].button("Edit", key=f"edit_student_private_{msg_id}"):
-                                st.session_state[f"edit_student_private_{msg_id}"] = True
-                            if cols[1].button("Delete", key=f"delete_student_private_{msg_id}"):
-                                delete_private_message(msg_id)
-                        if st.session_state.get(f"edit_student_private_{msg_id}", False):
-                            new_content = st.text_area("Edit Message", value=content, key=f"edit_student_private_content_{msg_id}")
-                            if st.button("Save", key=f"save_student_private_{msg_id}"):
-                                edit_private_message(msg_id, new_content)
-                                st.session_state[f"edit_student_private_{msg_id}"] = False
-                            if st.button("Cancel", key=f"cancel_student_private_{msg_id}"):
-                                st.session_state[f"edit_student_private_{msg_id}"] = False
+                    show_load_older(private_key, private_cache, fetch_before)
+                    render_conversation(private_cache, current_user)
+                    if chat_with in unread and private_cache["rows"]:
+                        mark_conversation_read(current_user, chat_with, next(reversed(private_cache["rows"])))
+                    is_own = lambda row: row[1] == current_user
+                    show_message_actions("student_private", messages, can_edit=is_own, can_delete=is_own,
+                                         on_edit=edit_private_message, on_delete=delete_private_message)
                 else:
                     st.info("All messages in this chat are hidden for you. Click 'Refresh' to show again.")
-                st.markdown('</div>', unsafe_allow_html=True)
                 st.markdown("---")
                 if st.session_state.get("clear_student_private_new_msg", False):
                     st.session_state["student_private_new_msg"] = ""
@@ -174,21 +212,19 @@ def show_messenger():
             st.rerun()
         st.subheader("Personal Chat (Admins)")
         st.caption("Students can chat with admins. Admins can chat with students.")
-        current_user = st.session_state.get("username")
-        current_role = st.session_state.get("role")
-        all_users = get_all_users() if 'get_all_users' in globals() or 'get_all_users' in locals() else []
-        admin_usernames = [u[1] for u in all_users if u[2] == "Admin"]
         chat_with = None
         if current_role == "Admin":
-            all_students = [u[1] for u in all_users if u[2] == "Student"]
             if all_students:
-                selected_student = st.selectbox("Select Student to Chat With", all_students, key="admin_to_student_select")
+                selected_student = st.selectbox("Select Student to Chat With", all_students, key="admin_to_student_select", format_func=with_unread)
                 chat_with = selected_student
         elif current_role == "Student":
             if admin_usernames:
-                selected_admin = st.selectbox("Select Admin to Chat With", admin_usernames, key="student_to_admin_select")
+                selected_admin = st.selectbox("Select Admin to Chat With", admin_usernames, key="student_to_admin_select", format_func=with_unread)
                 chat_with = selected_admin
         if chat_with:
+            private_key = conversation_key(current_user, chat_with)
+            fetch_changes = lambda since_seq: get_private_message_changes(current_user, chat_with, since_seq)
+            fetch_before = lambda before_id, limit: get_private_messages_before(current_user, chat_with, before_id, limit)
             # --- Delete All Buttons ---
             if current_role == "Admin":
                 col_del1, col_del2 = st.columns([1,1])
@@ -207,38 +243,18 @@ def show_messenger():
             else:
                 hide_for_me = False
             st.info(f"You are chatting with: {chat_with}")
-            messages = get_private_messages(current_user, chat_with)
-            st.markdown('<div style="border:2px solid #4a5568; border-radius:10px; padding:16px; background:#23272e; max-height:400px; overflow-y:auto;">', unsafe_allow_html=True)
+            private_cache = get_cached_messages(private_key, fetch_changes, fetch_before)
+            messages = private_cache["rows"].values()
             if not hide_for_me:
-                for msg_id, sender, receiver, content, timestamp, edited in messages:
-                    is_self = sender == current_user
-                    bubble_color = "#2563eb" if is_self else ("#f59e42" if sender.lower() == chat_with else "#374151")
-                    text_color = "#fff" if is_self or sender.lower() == chat_with else "#f7fafc"
-                    align = "right" if is_self else "left"
-                    st.markdown(f"""
-                    <div style='display:flex; flex-direction:column; align-items:{'flex-end' if is_self else 'flex-start'}; margin-bottom:8px;'>
-                        <div style='background:{bubble_color}; color:{text_color}; padding:10px 16px; border-radius:12px; max-width:70%; box-shadow:0 2px 8px #0002;'>
-                            <b>{sender}</b><br>{content}
-                            <div style='font-size:0.8em; color:#d1d5db; text-align:{align};'>{timestamp}{' (edited)' if edited else ''}</div>
-                        </div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    cols = st.columns([1,1,6])
-                    if is_self:
-                        if cols[0].button("Edit", key=f"edit_admin_private_{msg_id}"):
-                            st.session_state[f"edit_admin_private_{msg_id}"] = True
-                        if cols[1].button("Delete", key=f"delete_admin_private_{msg_id}"):
-                            delete_private_message(msg_id)
-                    if st.session_state.get(f"edit_admin_private_{msg_id}", False):
-                        new_content = st.text_area("Edit Message", value=content, key=f"edit_admin_private_content_{msg_id}")
-                        if st.button("Save", key=f"save_admin_private_{msg_id}"):
-                            edit_private_message(msg_id, new_content)
-                            st.session_state[f"edit_admin_private_{msg_id}"] = False
-                        if st.button("Cancel", key=f"cancel_admin_private_{msg_id}"):
-                            st.session_state[f"edit_admin_private_{msg_id}"] = False
+                show_load_older(private_key, private_cache, fetch_before)
+                render_conversation(private_cache, current_user, highlight=chat_with.lower())
+                if chat_with in unread and private_cache["rows"]:
+                    mark_conversation_read(current_user, chat_with, next(reversed(private_cache["rows"])))
+                is_own = lambda row: row[1] == current_user
+                show_message_actions("admin_private", messages, can_edit=is_own, can_delete=is_own,
+                                     on_edit=edit_private_message, on_delete=delete_private_message)
             else:
                 st.info("All messages in this chat are hidden for you. Click 'Refresh' to show again.")
-            st.markdown('</div>', unsafe_allow_html=True)
             st.markdown("---")
             if st.session_state.get("clear_admin_private_new_msg", False):
                 st.session_state["admin_private_new_msg"] = ""
@@ -1,7 +1,13 @@
 import streamlit as st
-import pandas as pd
-from db.database import add_update, get_user_updates, get_edit_permission, update_update, get_user
-from auth.auth import logout
+from datetime import date
+from db.database import upsert_update, get_user_updates, get_weeks
+from auth.auth import logout, current_user
+
+def submittable_weeks(weeks, submitted_weeks, today):
+    """Return the weeks open on today that are not yet submitted, or submitted but unlocked."""
+    return [week for week, opens_on, closes_on, locked in weeks
+            if (opens_on is None or opens_on <= today) and (closes_on is None or today <= closes_on)
+            and (week not in submitted_weeks or not locked)]
 
 def show_student_submission():
     """Display student dashboard for submitting or updating updates with enhanced UI."""
@@ -9,31 +15,30 @@ def show_student_submission():
         st.subheader("Submit Weekly Update 📝")
         if st.button("Refresh 🔄", key="student_refresh_btn"):
             st.rerun()
-        user = get_user(st.session_state.username)
+        user = current_user()
         user_id = user[0] if user else None
         updates = get_user_updates(user_id) if user_id else []
         submitted_weeks = [update[0] for update in updates]
         
-        allow_edits = get_edit_permission()
-        week_options = [w for w in range(1, 11) if w not in submitted_weeks]
-        if not week_options and not allow_edits:
-            st.warning("No weeks available for submission. Contact admin to clear data or enable edits.")
+        week_options = submittable_weeks(get_weeks(), submitted_weeks, date.today().isoformat())
+        if not week_options:
+            st.warning("No weeks available for submission. Contact admin to clear data or unlock a week.")
         else:
             col1, col2 = st.columns([1, 2])
             with col1:
-                week = st.selectbox("Week", week_options if not allow_edits else [w for w in range(1, 11)], key="student_week", help="Select a week to submit or update") if week_options or allow_edits else None
+                week = st.selectbox("Week", week_options, key="student_week", help="Select a week to submit or update",
+                                    format_func=lambda w: f"{w} (resubmit)" if w in submitted_weeks else str(w))
             with col2:
                 content = st.text_area("Progress Update", placeholder="e.g., 'Implemented CNN model'", key="student_content", height=100)
             
             if week is not None and st.button("Submit Update ✅", help="Submit or update your progress"):
                 if content:
                     with st.spinner("Submitting update..."):
-                        if week in submitted_weeks and allow_edits:
-                            update_update(user_id, week, content)
-                            st.success("Update modified successfully!")
-                        else:
-                            add_update(user_id, week, content)
-                            st.success("Update submitted successfully!")
+                        written = upsert_update(user_id, week, content)
+                    if written:
+                        st.success("Update modified successfully!" if week in submitted_weeks else "Update submitted successfully!")
                         st.rerun()  # Force immediate refresh
+                    else:
+                        st.error(f"Week {week} was locked in the meantime, so your submitted update was not changed.")
                 else:
                     st.error("Please enter update content")
\ No newline at end of file
@@ -1,12 +1,7 @@
 import streamlit as st
 import pandas as pd
 from db.database import get_user_id, get_user_updates, update_update
-# Add auto-refresh for admin view
-try:
-    from streamlit_autorefresh import st_autorefresh
-    st_autorefresh(interval=5000, key="admin_autorefresh")
-except ImportError:
-    pass  # Add 'streamlit-autorefresh' to requirements.txt if not present
+from ui.live import rerun_on_change
 
 def show_user_updates():
     """Display user updates for admin with edit functionality."""
@@ -20,6 +15,8 @@ def show_user_updates():
             st.rerun()
         user_id = get_user_id(selected_user)
         if user_id:
+            # Live view: rerun when this student's updates change.
+            rerun_on_change([f"updates:{user_id}", "updates:*"], "live_user_updates")
             updates = get_user_updates(user_id)
             if updates:
                 df = pd.DataFrame(updates, columns=["Week", "Content", "Timestamp"])
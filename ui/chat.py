@@ -0,0 +1,71 @@
+import html
+import streamlit as st
+from db.profiling import section
+
+# Shared by every bubble, so each message only carries its class names and text.
+CHAT_CSS = """<style>
+.pp-chat {border:2px solid #4a5568; border-radius:10px; padding:16px; background:#23272e; max-height:400px; overflow-y:auto;}
+.pp-msg {display:flex; flex-direction:column; align-items:flex-start; margin-bottom:8px;}
+.pp-msg > div {background:#374151; color:#f7fafc; padding:10px 16px; border-radius:12px; max-width:70%; box-shadow:0 2px 8px #0002;}
+.pp-msg small {display:block; font-size:0.8em; color:#d1d5db; text-align:left;}
+.pp-msg.pp-hi > div {background:#f59e42; color:#fff;}
+.pp-msg.pp-self {align-items:flex-end;}
+.pp-msg.pp-self > div {background:#2563eb; color:#fff;}
+.pp-msg.pp-self small {text-align:right;}
+</style>"""
+
+def message_html(sender, content, timestamp, edited, is_self, highlighted):
+    """Return the chat bubble for one message."""
+    css_class = "pp-msg pp-self" if is_self else ("pp-msg pp-hi" if highlighted else "pp-msg")
+    return (f"<div class='{css_class}'><div><b>{html.escape(sender)}</b><br>{html.escape(content)}"
+            f"<small>{html.escape(timestamp or '')}{' (edited)' if edited else ''}</small></div></div>")
+
+def conversation_html(messages, current_user, highlight=None):
+    """Return one HTML document for a window of (msg_id, sender, ..., content, timestamp, edited) rows.
+
+    highlight is a lower-cased sender whose bubbles are drawn in the accent colour.
+    """
+    bubbles = [message_html(row[1], row[-3], row[-2], row[-1], row[1] == current_user, row[1].lower() == highlight)
+               for row in messages]
+    return f"{CHAT_CSS}<div class='pp-chat'>{''.join(bubbles)}</div>"
+
+@section("render_conversation")
+def render_conversation(entry, current_user, highlight=None):
+    """Draw a cached conversation as a single markdown element.
+
+    The HTML is kept on the cache entry and only rebuilt when the entry's seq or
+    window changes, so a rerun with nothing new costs one dict lookup.
+    """
+    memo_key = (entry["seq"], len(entry["rows"]), next(iter(entry["rows"]), None), current_user, highlight)
+    if entry.get("html_key") != memo_key:
+        entry["html"] = conversation_html(entry["rows"].values(), current_user, highlight)
+        entry["html_key"] = memo_key
+    st.markdown(entry["html"], unsafe_allow_html=True)
+
+def preview(content, width=40):
+    content = " ".join(content.split())
+    return content if len(content) <= width else content[:width - 1] + "…"
+
+@section("show_message_actions")
+def show_message_actions(prefix, messages, can_edit, can_delete, on_edit, on_delete):
+    """One selectbox plus Edit/Delete for the messages the user may change.
+
+    Replaces a row of buttons under every bubble. can_edit/can_delete take a
+    message row; on_edit(msg_id, content) and on_delete(msg_id) do the write.
+    """
+    actionable = {row[0]: row for row in messages if can_edit(row) or can_delete(row)}
+    if not actionable:
+        return
+    with st.expander("Edit or delete a message"):
+        msg_id = st.selectbox("Message", list(reversed(actionable)), key=f"{prefix}_action_select",
+                              format_func=lambda i: f"{actionable[i][-2]} · {preview(actionable[i][-3])}")
+        row = actionable[msg_id]
+        if can_edit(row):
+            new_content = st.text_area("Edit Message", value=row[-3], key=f"{prefix}_action_content_{msg_id}")
+        cols = st.columns([1, 1, 6])
+        if can_edit(row) and cols[0].button("Save", key=f"{prefix}_action_save"):
+            on_edit(msg_id, new_content)
+            st.rerun()
+        if can_delete(row) and cols[1].button("Delete", key=f"{prefix}_action_delete"):
+            on_delete(msg_id)
+            st.rerun()
@@ -0,0 +1,22 @@
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from db.notifications import bus
+
+POLL_INTERVAL = 2
+
+@st.fragment(run_every=POLL_INTERVAL)
+def rerun_on_change(topics, key):
+    """Rerun the whole app once any of topics is published on the change bus.
+
+    Only this empty fragment runs every POLL_INTERVAL seconds, and it reads the
+    in-memory bus, so an idle page costs no database queries and no full rerun.
+    """
+    topics = tuple(topics)
+    versions = bus.versions(topics)
+    seen = st.session_state.get(key)
+    st.session_state[key] = (topics, versions)
+    ctx = get_script_run_ctx()
+    # A full app run already shows the latest data; only a timer tick of this
+    # fragment needs to trigger one.
+    if ctx and ctx.fragment_ids_this_run and seen and seen[0] == topics and seen[1] != versions:
+        st.rerun(scope="app")
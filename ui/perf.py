@@ -0,0 +1,28 @@
+import pandas as pd
+import streamlit as st
+from db.cache import get_cache_stats
+from db.database import get_startup_timing
+from db.profiling import recent_traces, slowest
+
+def show_perf_panel():
+    """Admin-only sidebar panel with the slowest page sections and queries of recent reruns.
+
+    Covers reruns of every session in this process; the current rerun is not
+    finished yet, so it shows up from the next one on.
+    """
+    traces = recent_traces()
+    with st.sidebar.expander("Performance ⏱️", expanded=False):
+        if not traces:
+            st.caption("No reruns traced yet.")
+            return
+        times = sorted(trace["ms"] for trace in traces)
+        st.caption(f"{len(traces)} recent reruns · median {times[len(times) // 2]:.0f} ms · "
+                   f"slowest {times[-1]:.0f} ms ({max(traces, key=lambda t: t['ms'])['page']})")
+        for kind, title in (("section", "Slowest sections"), ("query", "Slowest queries")):
+            st.markdown(f"**{title}**")
+            st.dataframe(pd.DataFrame(slowest(kind), columns=["Name", "Calls", "Total ms", "Max ms"]),
+                         hide_index=True, use_container_width=True)
+        cache = get_cache_stats()
+        setup = ", ".join(f"{ms:.0f} ms" for ms in get_startup_timing().values())
+        st.caption(f"Schema setup: {setup or 'n/a'} · shared cache: {cache['hits']} hits, "
+                   f"{cache['misses']} misses, {cache['entries']} entries")